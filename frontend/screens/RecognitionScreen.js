@@ -4,10 +4,15 @@ import { Button, Text, Card } from "react-native-paper";
 import * as ImagePicker from "react-native-image-picker";
 import axios from "axios";
 
+const SERVER_URL = "http://YOUR_FLASK_SERVER_IP:5000";
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
 export default function RecognitionScreen() {
   const [imageUri, setImageUri] = useState(null);
   const [recognizedText, setRecognizedText] = useState("");
   const [loading, setLoading] = useState(false);
+  const [progress, setProgress] = useState("");
 
   const pickImage = () => {
     ImagePicker.launchImageLibrary({ mediaType: "photo" }, (response) => {
@@ -48,15 +53,27 @@ export default function RecognitionScreen() {
 
     try {
       setLoading(true);
-      const response = await axios.post("http://YOUR_FLASK_SERVER_IP:5000/segment_and_recognize", formData, {
+      // Large photos are processed as a background job; poll until it finishes
+      const submitted = await axios.post(`${SERVER_URL}/jobs`, formData, {
         headers: { "Content-Type": "multipart/form-data" },
       });
+      let job = submitted.data;
+      while (job.status === "queued" || job.status === "running") {
+        setProgress(job.status === "queued" ? "Queued..." : `${job.stage} ${Math.round(job.progress * 100)}%`);
+        await sleep(1000);
+        job = (await axios.get(`${SERVER_URL}${submitted.data.status_url}`)).data;
+      }
+      if (job.status === "failed") {
+        Alert.alert("Error", job.error || "Failed to process the image.");
+        return;
+      }
 
-      setRecognizedText(response.data.recognized_text || "No text recognized.");
+      setRecognizedText(job.result.recognized_text || "No text recognized.");
     } catch (error) {
       Alert.alert("Error", "Failed to process the image.");
     } finally {
       setLoading(false);
+      setProgress("");
     }
   };
 
@@ -79,7 +96,7 @@ export default function RecognitionScreen() {
         Capture Image
       </Button>
       <Button mode="contained" onPress={uploadImage} loading={loading} disabled={loading} style={styles.button} icon="upload">
-        {loading ? "Processing..." : "Recognize Text"}
+        {loading ? progress || "Uploading..." : "Recognize Text"}
       </Button>
 
       {recognizedText ? (
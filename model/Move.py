@@ -1,48 +1,162 @@
+"""Copy a random subset of images from one folder to another.
+
+    python Move.py images/train_v2/train images/train --count 100000 --seed 42
+
+Files are linked or copied by a thread pool. When source and destination are
+on the same filesystem they are hardlinked, otherwise copied with
+shutil.copyfile, which uses sendfile on Linux. Every finished file is
+appended to a manifest in the destination folder, so an interrupted run
+picks up where it stopped when rerun. The manifest also records the seed
+and count of the subset, so a rerun without --seed resumes the same one.
+"""
+import argparse
 import os
 import random
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+VALID_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".webp")
+MANIFEST_NAME = ".copied_manifest"
+# First manifest line, followed by the seed and count of the subset
+MANIFEST_HEADER = "# subset "
 
-# Function to copy a random subset of image files
-def copy_random_images(source_folder, destination_folder, num_images_to_copy):
-    # Ensure the source folder exists
-    if not os.path.exists(source_folder):
+# List image file names in the source folder, sorted so a seed always picks the same subset
+def list_images(source_folder):
+    if not os.path.isdir(source_folder):
         raise FileNotFoundError(f"Source folder not found: {source_folder}")
-    
-    # Create the destination folder if it doesn't exist
-    os.makedirs(destination_folder, exist_ok=True)
+    with os.scandir(source_folder) as entries:
+        return sorted(entry.name for entry in entries
+                      if entry.name.lower().endswith(VALID_EXTENSIONS) and entry.is_file())
 
-    # Get a list of all image files in the source folder
-    valid_extensions = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".webp")  # Add more extensions as needed
-    all_files = [file for file in os.listdir(source_folder) 
-                 if file.lower().endswith(valid_extensions) 
-                 and os.path.isfile(os.path.join(source_folder, file))]
+def select_images(all_files, count, seed=None):
+    if count > len(all_files):
+        raise ValueError(f"Requested {count} files, but only {len(all_files)} are available.")
+    return random.Random(seed).sample(all_files, count)
 
-    # Check if the number of requested files exceeds the available files
-    if num_images_to_copy > len(all_files):
-        raise ValueError(f"Requested {num_images_to_copy} files, but only {len(all_files)} are available.")
+def read_manifest(manifest_path):
+    """Return (seed, count) of the subset, or None for a manifest without them, and the names copied."""
+    if not os.path.exists(manifest_path):
+        return None, set()
+    with open(manifest_path) as f:
+        lines = [line.rstrip("\n") for line in f if line.strip()]
+    subset = None
+    if lines and lines[0].startswith(MANIFEST_HEADER):
+        seed, count = lines.pop(0)[len(MANIFEST_HEADER):].split()
+        subset = int(seed), int(count)
+    return subset, set(lines)
 
-    # Randomly select the specified number of files
-    selected_files = random.sample(all_files, num_images_to_copy)
+def resolve_mode(mode, source_folder, destination_folder):
+    if mode != "auto":
+        return mode
+    same_device = os.stat(source_folder).st_dev == os.stat(destination_folder).st_dev
+    return "link" if same_device else "copy"
 
-    # Copy each selected file to the destination folder
-    for file in selected_files:
-        source_path = os.path.join(source_folder, file)
-        destination_path = os.path.join(destination_folder, file)
+def transfer(source_path, destination_path, mode):
+    if os.path.exists(destination_path):
+        os.remove(destination_path)  # partial copy from an interrupted run
+    if mode == "link":
         try:
-            shutil.copy(source_path, destination_path)
-            print(f"Copied: {file}")
-        except Exception as e:
-            print(f"Failed to copy {file}: {e}")
-
-    print(f"Successfully copied {len(selected_files)} images to {destination_folder}")
-
-# Parameters
-source_folder = r"G:\GitHub\Handwritten_Image_Recognition\model\images\train_v2\train"  # Replace with the absolute path to your source folder
-destination_folder = r"G:\GitHub\Handwritten_Image_Recognition\model\images\train"  # Replace with the absolute path to your destination folder
-num_images_to_copy = 100000  # Number of images to copy
-
-# Execute the function
-try:
-    copy_random_images(source_folder, destination_folder, num_images_to_copy)
-except Exception as e:
-    print(f"Error: {e}")
+            os.link(source_path, destination_path)
+            return
+        except OSError:
+            pass  # e.g. the filesystem does not support hardlinks
+    shutil.copyfile(source_path, destination_path)
+
+
+class Progress:
+    """Thread-safe counter that prints at most once per `interval` seconds."""
+
+    def __init__(self, total, interval=2.0):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self._start = self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, ok):
+        with self._lock:
+            self.done += ok
+            self.failed += not ok
+            now = time.monotonic()
+            if now - self._last >= self.interval:
+                self._last = now
+                self.report()
+
+    def report(self):
+        elapsed = max(time.monotonic() - self._start, 1e-9)
+        print(f"{self.done}/{self.total} files ({self.done / elapsed:.0f}/s), {self.failed} failed")
+
+
+def copy_random_images(source_folder, destination_folder, num_images_to_copy, seed=None, workers=16,
+                       mode="auto", manifest_path=None):
+    """Copy a reproducible random subset and return the names that failed.
+
+    A resumed run copies the subset recorded in the manifest; a different
+    seed or count raises ValueError instead of adding a second subset.
+    """
+    manifest_path = manifest_path or os.path.join(destination_folder, MANIFEST_NAME)
+    subset, done = read_manifest(manifest_path)
+    if subset is not None:
+        if seed not in (None, subset[0]) or num_images_to_copy != subset[1]:
+            raise ValueError(f"{manifest_path} is for --seed {subset[0]} --count {subset[1]}")
+        seed = subset[0]
+    elif done and seed is None:
+        raise ValueError(f"{manifest_path} does not record its seed: rerun with the --seed of the first run")
+    elif seed is None:
+        seed = random.randrange(2 ** 32)
+    selected_files = select_images(list_images(source_folder), num_images_to_copy, seed)
+    os.makedirs(destination_folder, exist_ok=True)
+    pending = [file for file in selected_files if file not in done]
+    mode = resolve_mode(mode, source_folder, destination_folder)
+    print(f"{len(selected_files) - len(pending)} of {len(selected_files)} already copied, "
+          f"{len(pending)} to go ({mode})")
+
+    progress = Progress(len(pending))
+    failures = []
+    manifest_lock = threading.Lock()
+
+    def copy_one(file):
+        try:
+            transfer(os.path.join(source_folder, file), os.path.join(destination_folder, file), mode)
+        except OSError as e:
+            failures.append((file, e))
+            progress.update(False)
+            return
+        with manifest_lock:
+            manifest.write(file + "\n")
+        progress.update(True)
+
+    with open(manifest_path, "a", buffering=1) as manifest, ThreadPoolExecutor(workers) as pool:
+        if subset is None and not done:
+            manifest.write(f"{MANIFEST_HEADER}{seed} {num_images_to_copy}\n")
+        # Consume the iterator so worker exceptions surface here
+        for _ in pool.map(copy_one, pending):
+            pass
+
+    progress.report()
+    for file, e in failures[:10]:
+        print(f"Failed to copy {file}: {e}")
+    print(f"Copied {progress.done} images to {destination_folder}")
+    return [file for file, _ in failures]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source_folder")
+    parser.add_argument("destination_folder")
+    parser.add_argument("--count", type=int, required=True, help="number of images to copy")
+    parser.add_argument("--seed", type=int, help="seed for a reproducible subset (default: random, kept in the manifest)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--mode", choices=["auto", "link", "copy"], default="auto",
+                        help="auto hardlinks when both folders share a filesystem")
+    parser.add_argument("--manifest", help=f"resume manifest (default: <destination>/{MANIFEST_NAME})")
+    args = parser.parse_args()
+
+    failures = copy_random_images(args.source_folder, args.destination_folder, args.count, args.seed,
+                                  args.workers, args.mode, args.manifest)
+    raise SystemExit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
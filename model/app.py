@@ -1,114 +1,123 @@
-from flask import Flask, request, send_file, jsonify
-import cv2
-import numpy as np
-from tensorflow.keras.models import load_model
-from tensorflow.keras import backend as K
-from PIL import Image
-from fpdf import FPDF
-import tempfile
+import json
+from flask import Flask, Response, request, jsonify, stream_with_context
 import os
 from flask_cors import CORS
+from model_registry import registry
+from recognition import recognize_words, predict_in_chunks
+from inference_scheduler import BatchScheduler, MAX_BATCH_SIZE
+from segmentation import word_segmentation, segmentation_params
+from result_cache import ResultCache, make_key, model_version
+from crop_cache import CropCache
+from request_io import read_image, pdf_response, encode_pdf
+from pdf_builder import numbered_pages_pdf
+from batch_pipeline import iter_pages, run_pipeline
+from metrics import instrument_app, timed, timer, count_items
 
 app = Flask(__name__)
 CORS(app)
+instrument_app(app)
 
-# Load the saved model
-def load_saved_model(model_path):
-    return load_model(model_path, compile=False)
-
-# Preprocess the image for word segmentation
-def thresholding(image):
-    img_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(img_gray, 80, 255, cv2.THRESH_BINARY_INV)
-    return thresh
-
-def word_segmentation(image):
-    h, w, _ = image.shape
-    if w > 1000:
-        new_w = 1000
-        ar = w / h
-        new_h = int(new_w / ar)
-        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
-
-    thresh_img = thresholding(image)
-    kernel_line = np.ones((3, 85), np.uint8)
-    dilated_line = cv2.dilate(thresh_img, kernel_line, iterations=1)
-    contours, _ = cv2.findContours(dilated_line.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-    sorted_contours_lines = sorted(contours, key=lambda ctr: cv2.boundingRect(ctr)[1])
-
-    kernel_word = np.ones((3, 15), np.uint8)
-    dilated_word = cv2.dilate(thresh_img, kernel_word, iterations=1)
-    words_list = []
-
-    for line in sorted_contours_lines:
-        x, y, w, h = cv2.boundingRect(line)
-        roi_line = dilated_word[y:y+h, x:x+w]
-        cnt, _ = cv2.findContours(roi_line.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-        sorted_contour_words = sorted(cnt, key=lambda cntr: cv2.boundingRect(cntr)[0])
-
-        for word in sorted_contour_words:
-            if cv2.contourArea(word) < 400:
-                continue
-            x2, y2, w2, h2 = cv2.boundingRect(word)
-            words_list.append([x + x2, y + y2, x + x2 + w2, y + y2 + h2])
-
-    return image, words_list
-
-def preprocess_image(image, img_size=(256, 64)):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    h, w = gray.shape
-    final_img = np.ones((img_size[1], img_size[0])) * 255
-    if w > img_size[0]:
-        gray = gray[:, :img_size[0]]
-    if h > img_size[1]:
-        gray = gray[:img_size[1], :]
-    final_img[:gray.shape[0], :gray.shape[1]] = gray
-    final_img = cv2.rotate(final_img, cv2.ROTATE_90_CLOCKWISE) / 255.0
-    return np.expand_dims(final_img, axis=(0, -1))
-
-def decode_prediction(prediction, alphabet):
-    decoded_text = K.ctc_decode(prediction, input_length=np.ones(prediction.shape[0]) * prediction.shape[1])[0][0]
-    decoded_text = K.get_value(decoded_text)
-    return ''.join([alphabet[i] for i in decoded_text[0] if i != -1])
+MODEL_PATH = "handwriting_model.h5"
+BATCH_SIZE = int(os.environ.get("RECOGNITION_BATCH_SIZE", 64))
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ-' "
 
-@app.route('/process', methods=['POST'])
-def process_image():
-    model_path = "handwriting_model.h5"
-    model = load_saved_model(model_path)
-    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ-' "
+# Load and warm the model once per process instead of once per request
+registry.warm_up_async([MODEL_PATH])
 
-    if 'image' not in request.files:
-        return jsonify({"error": "No image file provided"}), 400
+def predict_words(batch):
+    return predict_in_chunks(registry.get_model(MODEL_PATH), batch, MAX_BATCH_SIZE)
 
-    file = request.files['image']
-    image = np.array(Image.open(file).convert("RGB"))
-    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+# Word crops from concurrent requests share predict calls
+scheduler = BatchScheduler(predict_words)
 
-    processed_img, word_boxes = word_segmentation(image)
-    predictions = []
+# Results of repeated uploads are served from cache
+result_cache = ResultCache()
+# Versioned by the file actually served, so re-exporting it invalidates the cache
+CACHE_VERSION = model_version(registry.served_path(MODEL_PATH))
+# Repeated word crops (headers, names) skip inference
+word_cache = CropCache()
 
-    for word in word_boxes:
-        x1, y1, x2, y2 = word
-        word_img = processed_img[y1:y2, x1:x2]
-        processed_word_img = preprocess_image(word_img)
-        prediction = model.predict(processed_word_img)
-        predicted_text = decode_prediction(prediction, alphabet)
-        predictions.append(predicted_text)
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    body, status = registry.health()
+    return jsonify(body), status
 
-    # Create a temporary PDF to store results
-    temp_pdf_path = os.path.join(tempfile.gettempdir(), "output.pdf")
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
+@app.route('/scheduler_stats', methods=['GET'])
+def scheduler_stats():
+    return jsonify(scheduler.stats())
 
-    for i, text in enumerate(predictions):
-        pdf.cell(0, 10, f"{i + 1}. {text}", ln=True)
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify({"results": result_cache.stats(), "words": word_cache.stats()})
 
-    pdf.output(temp_pdf_path)
+@timed("segmentation")
+def segment_page(image):
+    return word_segmentation(image)
+
+# Build the result PDF in memory, one section per page of predictions
+build_pdf = timed("pdf")(numbered_pages_pdf)
+
+def recognize_page(processed_img, word_boxes):
+    """Return the page's predictions and the word cache hit rate for the page."""
+    count_items("words", len(word_boxes))
+    stats = {}
+    predictions = recognize_words(processed_img, word_boxes, scheduler, ALPHABET, batch_size=BATCH_SIZE,
+                                  cache=word_cache, stats=stats)
+    return predictions, hit_rate(stats)
+
+def hit_rate(stats):
+    return stats["hits"] / stats["lookups"] if stats.get("lookups") else 0.0
+
+@app.route('/process', methods=['POST'])
+def process_image():
+    if 'image' not in request.files:
+        return jsonify({"error": "No image file provided"}), 400
+
+    with timer("read_image"):
+        image = read_image(request.files['image'])
+    if image is None:
+        return jsonify({"error": "Cannot decode image"}), 400
+
+    key = make_key(image, CACHE_VERSION, {"segmentation": segmentation_params(), "alphabet": ALPHABET})
+    predictions = result_cache.get(key)
+    word_hit_rate = None
+    if predictions is None:
+        processed_img, word_boxes = segment_page(image)
+        predictions, word_hit_rate = recognize_page(processed_img, word_boxes)
+        result_cache.put(key, predictions)
 
     # Return the PDF file
-    return send_file(temp_pdf_path, as_attachment=True, download_name="output.pdf")
+    response = pdf_response(build_pdf([predictions]), "output.pdf")
+    if word_hit_rate is not None:
+        response.headers["X-Word-Cache-Hit-Rate"] = f"{word_hit_rate:.3f}"
+    return response
+
+@app.route('/process_batch', methods=['POST'])
+def process_batch():
+    """Process many pages and stream one NDJSON line per page as it finishes.
+
+    Accepts any number of files under `images` (or `image`); zip archives and
+    multi-frame TIFFs are expanded into pages. The last line carries the
+    assembled PDF of all pages in upload order as base64.
+    """
+    files = request.files.getlist('images') + request.files.getlist('image')
+    if not files:
+        return jsonify({"error": "No image files provided"}), 400
+    uploads = [(f.filename, f.read()) for f in files]
+
+    def generate():
+        results = {}
+        for index, name, result in run_pipeline(iter_pages(uploads), segment_page, recognize_page):
+            if isinstance(result, Exception):
+                yield json.dumps({"page": index, "name": name, "error": str(result)}) + "\n"
+                continue
+            results[index], word_hit_rate = result
+            yield json.dumps({"page": index, "name": name, "words": results[index],
+                              "word_cache_hit_rate": word_hit_rate}) + "\n"
+        pdf_bytes = build_pdf(results[index] for index in sorted(results))
+        yield json.dumps({"done": True, "pages": len(results), "pdf_base64": encode_pdf(pdf_bytes)}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 if __name__ == "__main__":
     app.run(debug=True)
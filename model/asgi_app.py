@@ -0,0 +1,168 @@
+"""Async (ASGI) serving mode of the /process word pipeline.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+
+Upload reads and responses run on the event loop. Decode, segmentation,
+preprocessing and PDF rendering go to a bounded process pool, so a huge
+scan occupies one worker instead of the server. Inference stays in this
+process on the shared micro-batching scheduler, and the model is loaded
+once. When ASYNC_MAX_PENDING pool tasks are queued or running, new
+requests get a 503 with Retry-After rather than waiting in an unbounded
+queue.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+import cpu_tasks
+import metrics
+from inference_scheduler import BatchScheduler, MAX_BATCH_SIZE
+from model_registry import registry
+from recognition import predict_cached, predict_in_chunks, decode_batch
+from result_cache import ResultCache, make_key, model_version
+from crop_cache import CropCache
+from segmentation import segmentation_params
+
+MODEL_PATH = "handwriting_model.h5"
+BATCH_SIZE = int(os.environ.get("RECOGNITION_BATCH_SIZE", 64))
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ-' "
+WORKERS = int(os.environ.get("ASYNC_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+MAX_PENDING = int(os.environ.get("ASYNC_MAX_PENDING", 2 * WORKERS))
+
+scheduler = BatchScheduler(lambda batch: predict_in_chunks(registry.get_model(MODEL_PATH), batch, MAX_BATCH_SIZE))
+result_cache = ResultCache()
+# Keyed on the upload bytes: pixels are only decoded inside the pool
+CACHE_VERSION = "upload:" + model_version(registry.served_path(MODEL_PATH))
+word_cache = CropCache()
+
+
+class Overloaded(Exception):
+    pass
+
+
+class PoolGate:
+    """Process pool that refuses work once `max_pending` tasks are in it.
+
+    Only touched from the event loop thread, so the counter needs no lock.
+    """
+
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.pool = None
+
+    def start(self):
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        # Spawn every worker up front instead of on the first requests
+        for future in [self.pool.submit(cpu_tasks.ping) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def check(self):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded()
+
+    async def run(self, fn, *args, admitted=False):
+        """Run fn(*args) in the pool. Raises Overloaded when it is full, unless
+        the request was `admitted` earlier and this only finishes its work."""
+        if not admitted:
+            self.check()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def stats(self):
+        return {"workers": self.workers, "pending": self.pending, "max_pending": self.max_pending,
+                "rejected": self.rejected}
+
+
+gate = PoolGate()
+
+def recognize_batch(batch):
+    """Predict (through the word cache) and decode a preprocessed batch; runs in a thread."""
+    if len(batch) == 0:
+        return [], 0.0
+    stats = {}
+    with metrics.timer("predict"):
+        prediction = predict_cached(scheduler, batch, BATCH_SIZE, word_cache, stats)
+    with metrics.timer("ctc_decode"):
+        predictions = decode_batch(prediction, ALPHABET)
+    return predictions, stats["hits"] / stats["lookups"]
+
+async def process_image(request):
+    # Refuse before reading the body when the pool is already full
+    gate.check()
+    form = await request.form()
+    upload = form.get("image")
+    if upload is None or isinstance(upload, str):
+        return JSONResponse({"error": "No image file provided"}, status_code=400)
+    data = await upload.read()
+
+    key = make_key(np.frombuffer(data, np.uint8), CACHE_VERSION,
+                   {"segmentation": segmentation_params(), "alphabet": ALPHABET})
+    predictions = result_cache.get(key)
+    word_hit_rate = None
+    if predictions is None:
+        # Pool timings include the wait for a free worker
+        try:
+            with metrics.timer("segmentation"):
+                batch = await gate.run(cpu_tasks.segment_upload, data)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        metrics.count_items("words", len(batch))
+        predictions, word_hit_rate = await asyncio.to_thread(recognize_batch, batch)
+        result_cache.put(key, predictions)
+
+    # Admitted by the check above: a 503 now would waste the work already done
+    with metrics.timer("pdf"):
+        pdf_bytes = await gate.run(cpu_tasks.render_pdf, [predictions], admitted=True)
+    headers = {"Content-Disposition": 'attachment; filename="output.pdf"'}
+    if word_hit_rate is not None:
+        headers["X-Word-Cache-Hit-Rate"] = f"{word_hit_rate:.3f}"
+    return Response(pdf_bytes, media_type="application/pdf", headers=headers)
+
+async def healthz(request):
+    body, status = registry.health()
+    return JSONResponse(body, status_code=status)
+
+async def pool_stats(request):
+    return JSONResponse({"pool": gate.stats(), "scheduler": scheduler.stats()})
+
+async def cache_stats(request):
+    return JSONResponse({"results": result_cache.stats(), "words": word_cache.stats()})
+
+async def metrics_endpoint(request):
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+async def overloaded(request, exc):
+    return JSONResponse({"error": "Server busy, retry later"}, status_code=503, headers={"Retry-After": "1"})
+
+@asynccontextmanager
+async def lifespan(app):
+    registry.warm_up_async([MODEL_PATH])
+    await asyncio.to_thread(gate.start)
+    yield
+    gate.shutdown()
+
+routes = [
+    Route("/process", process_image, methods=["POST"]),
+    Route("/healthz", healthz),
+    Route("/pool_stats", pool_stats),
+    Route("/cache_stats", cache_stats),
+]
+if metrics.ENABLED:
+    routes.append(Route("/metrics", metrics_endpoint))
+
+app = Starlette(routes=routes, lifespan=lifespan, exception_handlers={Overloaded: overloaded})
@@ -0,0 +1,96 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+WORKERS = int(os.environ.get("BATCH_WORKERS", 2))
+# Pages decoded and not yet returned; bounds memory for very long notebooks
+MAX_IN_FLIGHT = int(os.environ.get("BATCH_MAX_IN_FLIGHT", 4))
+
+def iter_pages(uploads):
+    """Yield (name, BGR page) for every page of the uploaded files.
+
+    `uploads` is an iterable of (filename, bytes). Zip archives are expanded
+    to their image members and multi-frame TIFFs to one page per frame. A
+    file or member that cannot be read is yielded as (name, exception), so
+    one bad upload does not end the batch.
+    """
+    for filename, data in uploads:
+        if zipfile.is_zipfile(io.BytesIO(data)):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for member in sorted(archive.namelist()):
+                    if member.lower().endswith(IMAGE_EXTENSIONS):
+                        try:
+                            data = archive.read(member)
+                        except (zipfile.BadZipFile, OSError) as e:  # corrupt member
+                            yield member, e
+                            continue
+                        yield from _named_frames(member, data)
+        else:
+            yield from _named_frames(filename, data)
+
+def _named_frames(name, data):
+    # Frames are decoded one at a time as the pipeline asks for pages, so
+    # MAX_IN_FLIGHT also bounds memory for a multi-frame TIFF
+    from PIL import Image
+    try:
+        img = Image.open(io.BytesIO(data))
+        count = getattr(img, "n_frames", 1)
+    except Exception:  # not an image
+        yield name, ValueError("Cannot decode image")
+        return
+    with img:
+        for idx in range(count):
+            frame_name = name if count == 1 else f"{name}#{idx + 1}"
+            try:
+                img.seek(idx)
+                frame = cv2.cvtColor(np.array(img.convert("RGB")), cv2.COLOR_RGB2BGR)
+            except Exception:  # a truncated one: later frames cannot be read either
+                yield frame_name, ValueError("Cannot decode image")
+                return
+            yield frame_name, frame
+
+def _reraise(error):
+    raise error
+
+def run_pipeline(pages, segment, recognize, workers=WORKERS, max_in_flight=MAX_IN_FLIGHT):
+    """Segment and recognize pages concurrently, yielding results as they finish.
+
+    Segmentation runs in one pool and recognition in another, so page N+1
+    is segmented while page N is being recognized. Yields
+    (index, name, result) in completion order, where result is
+    recognize(*segment(page)), or the exception raised for that page. A
+    page given as an exception (see iter_pages) is yielded as its result.
+    """
+    pages = enumerate(pages)
+    with ThreadPoolExecutor(workers) as segment_pool, ThreadPoolExecutor(workers) as recognize_pool:
+        pending = {}
+
+        def submit_next():
+            item = next(pages, None)
+            if item is None:
+                return False
+            index, (name, page) = item
+            if isinstance(page, Exception):
+                recognized = recognize_pool.submit(_reraise, page)
+            else:
+                segmented = segment_pool.submit(segment, page)
+                recognized = recognize_pool.submit(lambda: recognize(*segmented.result()))
+            pending[recognized] = (index, name)
+            return True
+
+        while len(pending) < max_in_flight and submit_next():
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                yield index, name, result
+                submit_next()
@@ -0,0 +1,82 @@
+"""Parity, latency and RSS of the keras, tflite and onnx inference backends.
+
+Each backend runs in its own subprocess so its import cost and peak RSS are
+measured in isolation. Exits non-zero if a backend's outputs differ from
+Keras by more than --atol.
+
+Run from the model folder after export_models.py:
+    python -m benchmarks.bench_backends handwriting_model.h5
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from model_registry import MODEL_SPECS
+
+def worker(backend, model_path, batch_size, output_path):
+    start = time.perf_counter()
+    from inference_backend import load_backend
+    model = load_backend(model_path, backend)
+    load_time = time.perf_counter() - start
+
+    shape = MODEL_SPECS.get(model_path, {"input_shape": (256, 64, 1)})["input_shape"]
+    batch = np.random.default_rng(0).random((batch_size,) + shape, dtype=np.float32)
+    model.predict_on_batch(batch)  # warm-up
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        output = model.predict_on_batch(batch)
+        timings.append(time.perf_counter() - start)
+    np.save(output_path, output)
+
+    print(json.dumps({
+        "load_s": load_time,
+        "predict_ms": min(timings) * 1000,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "imports_tensorflow": "tensorflow" in sys.modules,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model", nargs="?", default="handwriting_model.h5")
+    parser.add_argument("--backends", nargs="+", default=["keras", "tflite", "onnx"])
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--atol", type=float, default=1e-4)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.model, args.batch_size, args.output)
+        return
+
+    results, outputs = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            output_path = os.path.join(tmp, f"{backend}.npy")
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_backends", args.model, "--worker", backend,
+                 "--batch-size", str(args.batch_size), "--output", output_path],
+                capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{backend}: failed\n{proc.stderr.strip().splitlines()[-1]}")
+                continue
+            results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+            outputs[backend] = np.load(output_path)
+
+    failed = False
+    print(f"{'backend':<8}{'load s':>8}{'predict ms':>12}{'RSS MB':>9}{'imports TF':>12}{'max diff':>11}")
+    for backend, result in results.items():
+        diff = float(np.abs(outputs[backend] - outputs["keras"]).max()) if "keras" in outputs else float("nan")
+        failed |= diff > args.atol
+        print(f"{backend:<8}{result['load_s']:>8.2f}{result['predict_ms']:>12.2f}{result['max_rss_mb']:>9.0f}"
+              f"{str(result['imports_tensorflow']):>12}{diff:>11.2e}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
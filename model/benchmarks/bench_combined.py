@@ -0,0 +1,77 @@
+"""End-to-end time of the Combined.py page graph: stages one at a time vs concurrently.
+
+For every sample page (plus a synthetic long page) the graph of
+page_pipeline.py is run with one worker, as the app used to, and with
+--workers threads. Reports the best-of wall time of each, the speedup, and
+the critical-path bound: the one-worker sum of stage times over the
+longest dependency chain, the best the graph allows with enough cores.
+
+Run from the model folder:
+    python -m benchmarks.bench_combined --model handwriting_model.h5
+"""
+import argparse
+import os
+import cv2
+
+os.environ.setdefault("MODEL_LAZY_LOAD", "1")
+
+from benchmarks.bench_segmentation import SAMPLE_PAGES, synthetic_page
+from inference_backend import load_backend
+from page_pipeline import page_graph
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ-' "
+
+def best_run(graph, image, workers, repeats):
+    best, best_timings = None, None
+    for _ in range(repeats):
+        graph.run({"image": image}, workers=workers)
+        wall = max(end for _, end in graph.timings.values())
+        if best is None or wall < best:
+            best, best_timings = wall, dict(graph.timings)
+    return best, best_timings
+
+def critical_path(graph, timings):
+    """Longest chain of stage durations through the dependency graph."""
+    finish = {"image": 0.0}
+
+    def finish_time(name):
+        if name not in finish:
+            fn, deps = graph.stages[name]
+            start, end = timings[name]
+            finish[name] = max(finish_time(dep) for dep in deps) + end - start
+        return finish[name]
+    return max(finish_time(name) for name in graph.stages)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="handwriting_model_2.h5")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--lines", type=int, default=40, help="lines on the synthetic page")
+    args = parser.parse_args()
+
+    graph = page_graph(load_backend(args.model), ALPHABET)
+    pages = [(name, cv2.imread(name)) for name in SAMPLE_PAGES]
+    pages.append((f"synthetic {args.lines} lines", synthetic_page(lines=args.lines)))
+    pages = [(name, cv2.cvtColor(image, cv2.COLOR_BGR2RGB)) for name, image in pages if image is not None]
+    for _, image in pages:  # warm-up: traces the model, loads fonts
+        graph.run({"image": image}, workers=1)
+
+    print(f"{os.cpu_count()} cpus, {args.workers} workers")
+    print(f"{'page':<22}{'1 worker ms':>12}{'graph ms':>10}{'speedup':>9}{'bound':>8}  slowest stages")
+    total_serial = total_graph = 0.0
+    for name, image in pages:
+        serial, serial_timings = best_run(graph, image, 1, args.repeats)
+        concurrent, _ = best_run(graph, image, args.workers, args.repeats)
+        total_serial += serial
+        total_graph += concurrent
+        durations = {stage: end - start for stage, (start, end) in serial_timings.items()}
+        slowest = sorted(durations, key=durations.get, reverse=True)[:3]
+        print(f"{name:<22}{serial * 1000:>12.1f}{concurrent * 1000:>10.1f}{serial / concurrent:>8.2f}x"
+              f"{sum(durations.values()) / critical_path(graph, serial_timings):>7.2f}x  "
+              + ", ".join(f"{stage} {durations[stage] * 1000:.1f}" for stage in slowest))
+    print(f"{'all pages':<22}{total_serial * 1000:>12.1f}{total_graph * 1000:>10.1f}"
+          f"{total_serial / total_graph:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
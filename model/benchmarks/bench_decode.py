@@ -0,0 +1,61 @@
+"""Decode time per page: K.ctc_decode per word vs NumPy greedy and beam search.
+
+Run from the model folder:  python -m benchmarks.bench_decode --words 200
+"""
+import argparse
+import time
+import numpy as np
+from ctc_decoder import greedy_decode, beam_search_decode
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ-' "
+
+# Synthetic softmax outputs shaped like handwriting_model.h5: (N, 64, 30)
+def synthetic_page(num_words, timesteps=64, num_classes=len(ALPHABET) + 1, seed=0):
+    rng = np.random.default_rng(seed)
+    logits = rng.normal(size=(num_words, timesteps, num_classes)).astype(np.float32)
+    # One peaked class per step, blank on most steps, like a trained CTC model
+    chars = rng.integers(0, num_classes - 1, size=(num_words, timesteps))
+    peak = np.where(rng.random((num_words, timesteps)) < 0.7, num_classes - 1, chars)
+    np.put_along_axis(logits, peak[..., None], 8.0, axis=2)
+    exp = np.exp(logits - logits.max(axis=2, keepdims=True))
+    return exp / exp.sum(axis=2, keepdims=True)
+
+def keras_per_word(page):
+    from tensorflow.keras import backend as K
+    texts = []
+    for i in range(len(page)):
+        prediction = page[i:i + 1]
+        decoded = K.get_value(K.ctc_decode(prediction, input_length=np.ones(1) * prediction.shape[1])[0][0])
+        texts.append(''.join(ALPHABET[c] for c in decoded[0] if c != -1))
+    return texts
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=200, help="words per page")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--beam-width", type=int, default=10)
+    parser.add_argument("--skip-keras", action="store_true", help="do not import TensorFlow")
+    args = parser.parse_args()
+
+    page = synthetic_page(args.words)
+    greedy_time, greedy = best_of(lambda: greedy_decode(page, ALPHABET), args.repeats)
+    beam_time, _ = best_of(lambda: beam_search_decode(page, ALPHABET, args.beam_width), 1)
+
+    print(f"page of {args.words} words")
+    print(f"numpy greedy       {greedy_time * 1000:9.2f} ms/page")
+    print(f"numpy beam (w={args.beam_width:<3}) {beam_time * 1000:9.2f} ms/page")
+    if not args.skip_keras:
+        keras_time, keras = best_of(lambda: keras_per_word(page), 1)
+        print(f"K.ctc_decode/word  {keras_time * 1000:9.2f} ms/page")
+        print(f"greedy matches K.ctc_decode: {greedy == keras}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Per-stage latency, throughput and peak memory of the /process and /segment_and_recognize pipelines.
+
+Every sample page and a synthetic large page are run through each stage:
+    words: segmentation -> preprocess -> predict -> decode -> pdf   (app.py)
+    chars: segmentation -> segment_characters -> classify -> pdf    (latest.py)
+Latency percentiles come from --repeats timed passes. Peak memory is the
+tracemalloc peak of one separate pass (NumPy and OpenCV buffers, not model
+runtime internals) plus the process max RSS. Write --json and diff runs
+with --compare.
+
+Run from the model folder:
+    python -m benchmarks.bench_pipeline --json bench.json
+    python -m benchmarks.bench_pipeline --compare bench.json --pipelines words
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+from collections import defaultdict
+import cv2
+import numpy as np
+
+# Importing the apps must not start a background model load that competes
+# with the timed stages
+os.environ.setdefault("MODEL_LAZY_LOAD", "1")
+
+from benchmarks.bench_segmentation import SAMPLE_PAGES, synthetic_page
+from inference_backend import load_backend, BACKEND, VARIANT
+from recognition import preprocess_batch, predict_in_chunks, decode_batch, build_label_lookup, classify_characters
+from segmentation import word_segmentation
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ-' "
+
+def word_stages(decode_mode, batch_size):
+    from app import build_pdf, MODEL_PATH
+    model = load_backend(MODEL_PATH)
+
+    def predict(batch):
+        # Pages without words skip the model, as recognize_words does
+        if not len(batch):
+            return np.empty((0, 64, len(ALPHABET) + 1), dtype=np.float32)
+        return predict_in_chunks(model, batch, batch_size)
+
+    return [
+        ("segmentation", lambda page: word_segmentation(page), lambda out: len(out[1])),
+        ("preprocess", lambda seg: preprocess_batch([seg[0][y1:y2, x1:x2] for x1, y1, x2, y2 in seg[1]]), len),
+        ("predict", predict, len),
+        ("decode", lambda probs: decode_batch(probs, ALPHABET, decode_mode), len),
+        ("pdf", lambda texts: build_pdf([texts]), lambda out: 1),
+    ]
+
+def char_stages(batch_size):
+    # latest.py hashes its model files at import
+    import latest
+    model = load_backend(latest.MODEL_PATH)
+    import joblib
+    labels = build_label_lookup(joblib.load("label_encoder_3.pkl"))
+    return [
+        ("segmentation", lambda page: latest.segment_words(cv2.cvtColor(page, cv2.COLOR_BGR2RGB)), len),
+        ("segment_characters", lambda words: [latest.segment_characters(w, i) for i, w in enumerate(words, 1)],
+         lambda out: sum(map(len, out))),
+        ("classify", lambda chars: classify_characters([c for cs in chars for c in cs], model, labels, batch_size),
+         lambda out: len(out[0])),
+        ("pdf", lambda out: latest.create_pdf(" ".join(out[0].tolist())), lambda out: 1),
+    ]
+
+def run_page(stages, page, timings, items, page_timings):
+    value = page
+    for name, fn, count in stages:
+        start = time.perf_counter()
+        value = fn(value)
+        elapsed = time.perf_counter() - start
+        timings[name].append(elapsed)
+        page_timings[name].append(elapsed)
+        items[name] += count(value)
+
+def peak_memory(stages, page):
+    """tracemalloc peak in MB of each stage for one page."""
+    peaks = {}
+    value = page
+    tracemalloc.start()
+    for name, fn, _ in stages:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        value = fn(value)
+        peaks[name] = (tracemalloc.get_traced_memory()[1] - base) / 1e6
+    tracemalloc.stop()
+    return peaks
+
+def summarize(timings, items, peaks, page_timings):
+    stages = {}
+    for name, samples in timings.items():
+        ms = np.array(samples) * 1000
+        stages[name] = {
+            "calls": len(ms),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p90_ms": float(np.percentile(ms, 90)),
+            "p99_ms": float(np.percentile(ms, 99)),
+            "mean_ms": float(ms.mean()),
+            "items_per_s": items[name] / (ms.sum() / 1000) if ms.sum() else 0.0,
+            "peak_mb": max(page_peaks.get(name, 0.0) for page_peaks in peaks),
+            # Pages differ by orders of magnitude in size, so diff these first
+            "page_p50_ms": {page: float(np.median(samples[name])) * 1000 for page, samples in page_timings.items()},
+        }
+    return stages
+
+def run_pipeline(stages, pages, repeats):
+    for _, page in pages:  # warm-up: traces the model, loads fonts
+        run_page(stages, page, defaultdict(list), defaultdict(int), defaultdict(list))
+    timings, items = defaultdict(list), defaultdict(int)
+    page_timings = {name: defaultdict(list) for name, _ in pages}
+    for _ in range(repeats):
+        for name, page in pages:
+            run_page(stages, page, timings, items, page_timings[name])
+    peaks = [peak_memory(stages, page) for _, page in pages]
+    return summarize(timings, items, peaks, page_timings)
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "backend": BACKEND, "variant": VARIANT, "python": platform.python_version(),
+            "numpy": np.__version__, "opencv": cv2.__version__, "cpus": os.cpu_count()}
+
+def print_report(results, baseline=None):
+    for pipeline, stages in results["pipelines"].items():
+        print(f"\n{pipeline}")
+        print(f"{'stage':<20}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'items/s':>10}{'peak MB':>9}"
+              + (f"{'p50 vs base':>13}" if baseline else ""))
+        for name, s in stages.items():
+            line = (f"{name:<20}{s['p50_ms']:>9.2f}{s['p90_ms']:>9.2f}{s['p99_ms']:>9.2f}"
+                    f"{s['items_per_s']:>10.0f}{s['peak_mb']:>9.1f}")
+            base = (baseline or {}).get("pipelines", {}).get(pipeline, {}).get(name)
+            if base:
+                line += f"{(s['p50_ms'] / base['p50_ms'] - 1) * 100:>+12.1f}%"
+            print(line)
+    print(f"\nmax RSS {results['max_rss_mb']:.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pipelines", nargs="+", choices=["words", "chars"], default=["words", "chars"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--lines", type=int, default=120, help="lines on the synthetic page")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--decode-mode", choices=["greedy", "beam"], default="greedy")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to diff against")
+    args = parser.parse_args()
+
+    pages = [(name, cv2.imread(name)) for name in SAMPLE_PAGES]
+    pages = [(name, page) for name, page in pages if page is not None]
+    pages.append((f"synthetic {args.lines} lines", synthetic_page(lines=args.lines)))
+
+    results = {"meta": metadata(), "pages": [name for name, _ in pages], "repeats": args.repeats, "pipelines": {}}
+    for pipeline in args.pipelines:
+        try:
+            stages = word_stages(args.decode_mode, args.batch_size) if pipeline == "words" else char_stages(args.batch_size)
+        except Exception as e:  # missing model or exported file
+            print(f"{pipeline}: skipped ({e})")
+            continue
+        results["pipelines"][pipeline] = run_pipeline(stages, pages, args.repeats)
+    results["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
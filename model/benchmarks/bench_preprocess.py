@@ -0,0 +1,63 @@
+"""Word preprocessing: previous float64 preprocess_image vs recognition.preprocess_batch.
+
+Run from the model folder:  python -m benchmarks.bench_preprocess
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from recognition import preprocess_batch
+from segmentation import word_segmentation
+from benchmarks.bench_segmentation import SAMPLE_PAGES, synthetic_page
+
+# The per-word function previously used by app.py and Combined.py
+def legacy_preprocess_image(image, img_size=(256, 64)):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    final_img = np.ones((img_size[1], img_size[0])) * 255
+    if w > img_size[0]:
+        gray = gray[:, :img_size[0]]
+    if h > img_size[1]:
+        gray = gray[:img_size[1], :]
+    final_img[:gray.shape[0], :gray.shape[1]] = gray
+    final_img = cv2.rotate(final_img, cv2.ROTATE_90_CLOCKWISE) / 255.0
+    return np.expand_dims(final_img, axis=(0, -1))
+
+def legacy_batch(crops):
+    # Keras converted the float64 batch to float32 before predicting
+    return np.concatenate([legacy_preprocess_image(crop) for crop in crops], axis=0).astype(np.float32)
+
+def page_crops(image):
+    page, boxes = word_segmentation(image)
+    return [page[y1:y2, x1:x2] for x1, y1, x2, y2 in boxes]
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = [(name, cv2.imread(name)) for name in SAMPLE_PAGES]
+    pages.append(("synthetic 120 lines", synthetic_page()))
+
+    print(f"{'page':<22}{'words':>7}{'legacy ms':>11}{'new ms':>9}{'speedup':>9}")
+    for name, image in pages:
+        if image is None:
+            continue
+        crops = page_crops(image)
+        if not crops:
+            continue
+        out = np.empty((len(crops), 256, 64, 1), dtype=np.float32)
+        legacy_time = best_of(lambda: legacy_batch(crops), args.repeats)
+        new_time = best_of(lambda: preprocess_batch(crops, out=out), args.repeats)
+        print(f"{name:<22}{len(crops):>7}{legacy_time * 1000:>11.2f}{new_time * 1000:>9.2f}{legacy_time / new_time:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
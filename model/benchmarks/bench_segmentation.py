@@ -0,0 +1,86 @@
+"""Word segmentation: per-line findContours (previous code) vs segmentation.py.
+
+Run from the model folder:  python -m benchmarks.bench_segmentation
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from segmentation import word_segmentation, thresholding
+
+SAMPLE_PAGES = ["s1.jpeg", "handwritten.jpg", "Notes.jpg", "Notes1.jpg", "im1.jpg"]
+
+# The implementation previously copy-pasted across app.py, Combined.py, Save.py and Word.py
+def legacy_word_segmentation(image):
+    h, w, _ = image.shape
+    if w > 1000:
+        new_w = 1000
+        ar = w / h
+        new_h = int(new_w / ar)
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
+
+    thresh_img = thresholding(image)
+    kernel_line = np.ones((3, 85), np.uint8)
+    dilated_line = cv2.dilate(thresh_img, kernel_line, iterations=1)
+    contours, _ = cv2.findContours(dilated_line.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    sorted_contours_lines = sorted(contours, key=lambda ctr: cv2.boundingRect(ctr)[1])
+
+    kernel_word = np.ones((3, 15), np.uint8)
+    dilated_word = cv2.dilate(thresh_img, kernel_word, iterations=1)
+    words_list = []
+
+    for line in sorted_contours_lines:
+        x, y, w, h = cv2.boundingRect(line)
+        roi_line = dilated_word[y:y+h, x:x+w]
+        cnt, _ = cv2.findContours(roi_line.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        sorted_contour_words = sorted(cnt, key=lambda cntr: cv2.boundingRect(cntr)[0])
+
+        for word in sorted_contour_words:
+            if cv2.contourArea(word) < 400:
+                continue
+            x2, y2, w2, h2 = cv2.boundingRect(word)
+            words_list.append([x + x2, y + y2, x + x2 + w2, y + y2 + h2])
+
+    return image, words_list
+
+# A tall scanned page of fake handwriting: rows of ink blobs of random width
+def synthetic_page(width=1000, lines=120, seed=0):
+    rng = np.random.default_rng(seed)
+    line_height = 60
+    page = np.full((lines * line_height + 40, width, 3), 255, np.uint8)
+    for i in range(lines):
+        x, y = 20, 20 + i * line_height
+        while x < width - 120:
+            word_w = int(rng.integers(30, 110))
+            cv2.putText(page, "m" * max(1, word_w // 18), (x, y + 30), cv2.FONT_HERSHEY_SCRIPT_SIMPLEX, 1.0, (0, 0, 0), 2)
+            x += word_w + int(rng.integers(30, 60))
+    return page
+
+def best_of(fn, image, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _, boxes = fn(image)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(boxes)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--lines", type=int, default=120, help="lines on the synthetic page")
+    args = parser.parse_args()
+
+    pages = [(name, cv2.imread(name)) for name in SAMPLE_PAGES]
+    pages.append((f"synthetic {args.lines} lines", synthetic_page(lines=args.lines)))
+
+    print(f"{'page':<22}{'legacy ms':>10}{'words':>7}{'new ms':>10}{'words':>7}{'speedup':>9}")
+    for name, image in pages:
+        if image is None:
+            continue
+        legacy_time, legacy_words = best_of(legacy_word_segmentation, image, args.repeats)
+        new_time, new_words = best_of(word_segmentation, image, args.repeats)
+        print(f"{name:<22}{legacy_time * 1000:>10.2f}{legacy_words:>7}{new_time * 1000:>10.2f}{new_words:>7}"
+              f"{legacy_time / new_time:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
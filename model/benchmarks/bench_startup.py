@@ -0,0 +1,78 @@
+"""Cold-start import time of the Flask entry points, with a budget.
+
+Each entry point is imported in a fresh interpreter under `python -X
+importtime` with MODEL_LAZY_LOAD=1, so the number is the time until the
+worker can accept requests, not model loading. Prints the wall time and the
+slowest top-level imports, and exits non-zero if an entry point is over
+--budget-ms or imports a module that must stay off the startup path.
+
+Run from the model folder:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup app --budget-ms 300 --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ENTRY_POINTS = ["app", "flaskapp", "latest"]
+# Loaded on first use only: model runtimes, plotting and PDF writers
+DEFERRED = ["tensorflow", "keras", "sklearn", "joblib", "matplotlib", "fpdf", "reportlab", "PIL"]
+
+def import_profile(module):
+    """Return (wall seconds, deferred modules loaded, {direct import: cumulative us}) for `module`."""
+    code = (f"import json, sys, time; start = time.perf_counter(); import {module}; "
+            f"print(json.dumps([time.perf_counter() - start, [m for m in {DEFERRED!r} if m in sys.modules]]))")
+    env = dict(os.environ, MODEL_LAZY_LOAD="1")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    # Children are printed before their parent, two spaces deeper per level:
+    # walk back from `module` over its direct imports to the previous top level
+    entries = []
+    for line in proc.stderr.splitlines():
+        fields = line.split("|")
+        if line.startswith("import time:") and len(fields) == 3 and fields[1].strip().isdigit():
+            name = fields[2].rstrip()
+            entries.append((len(name) - len(name.lstrip()), name.strip(), int(fields[1])))
+    # (a background thread importing at the same time can hide the module's own line)
+    end = max((i for i, (depth, name, _) in enumerate(entries) if depth == 1 and name == module), default=0)
+    packages = {}
+    for depth, name, cumulative in reversed(entries[:end]):
+        if depth == 1:
+            break
+        if depth == 3:
+            top = name.split(".")[0]
+            packages[top] = packages.get(top, 0) + cumulative
+    wall, deferred = json.loads(proc.stdout.strip().splitlines()[-1])
+    return wall, deferred, packages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("entry_points", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--budget-ms", type=float, default=500)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.entry_points:
+        try:
+            wall, deferred, packages = import_profile(module)
+        except RuntimeError as e:
+            print(f"{module}: import failed: {e}")
+            failed = True
+            continue
+        over = wall * 1000 > args.budget_ms
+        failed |= over or bool(deferred)
+        print(f"{module}: {wall * 1000:.0f} ms (budget {args.budget_ms:.0f} ms){'  OVER BUDGET' if over else ''}")
+        for name, us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {name:<24}{us / 1000:>8.1f} ms")
+        if deferred:
+            print(f"  imported at startup but should be deferred: {', '.join(deferred)}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Word segmentation of phone-photo sized pages: resize mode vs full resolution vs tiled mode.
+
+The sample pages are upscaled to --size (4000x3000 by default) to stand in
+for phone photos. For each page this prints the best-of time of resize mode,
+of one full-resolution pass and of tiled mode for each --workers count,
+with the words found and their median crop height in pixels. Resize mode
+crops come from the 1000 px page. "same" checks that the tiled boxes equal
+the full-resolution pass.
+
+Run from the model folder:  python -m benchmarks.bench_tiled
+"""
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+from benchmarks.bench_segmentation import SAMPLE_PAGES, synthetic_page
+from segmentation import (MAX_WIDTH, MIN_WORD_AREA, find_word_boxes, find_word_boxes_tiled, scaled_kernels,
+                          thresholding, word_segmentation)
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        boxes = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), boxes
+
+def crop_height(boxes):
+    return float(np.median(boxes[:, 3] - boxes[:, 1])) if len(boxes) else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--size", type=int, nargs=2, default=[4000, 3000], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="band counts to time; tiled mode splits the page into one band per worker")
+    args = parser.parse_args()
+
+    width, height = args.size
+    scale = width / MAX_WIDTH
+    kernel_line, kernel_word = scaled_kernels(scale)
+    pages = [(name, cv2.imread(name)) for name in SAMPLE_PAGES]
+    pages.append(("synthetic", synthetic_page(lines=40)))
+    print(f"{os.cpu_count()} cpus, OpenCV threads {cv2.getNumThreads()}, pages {width}x{height}")
+
+    header = f"{'page':<16}{'resize ms':>10}{'words':>6}{'crop h':>7}{'full ms':>9}{'words':>6}{'crop h':>7}"
+    header += "".join(f"{f'tiled w{n} ms':>14}" for n in args.workers) + f"{'same':>6}"
+    print(header)
+    for name, image in pages:
+        if image is None:
+            continue
+        page = cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+        resize_time, resize_boxes = best_of(lambda: word_segmentation(page, mode="resize")[1], args.repeats)
+        full_time, full_boxes = best_of(
+            lambda: find_word_boxes(thresholding(page), MIN_WORD_AREA * scale * scale, kernel_line, kernel_word),
+            args.repeats)
+        line = (f"{name:<16}{resize_time * 1000:>10.1f}{len(resize_boxes):>6}{crop_height(resize_boxes):>7.0f}"
+                f"{full_time * 1000:>9.1f}{len(full_boxes):>6}{crop_height(full_boxes):>7.0f}")
+        same = True
+        for workers in args.workers:
+            tiled_time, tiled_boxes = best_of(lambda: find_word_boxes_tiled(page, scale, workers=workers), args.repeats)
+            same &= set(map(tuple, tiled_boxes.tolist())) == set(map(tuple, full_boxes.tolist()))
+            line += f"{tiled_time * 1000:>14.1f}"
+        print(line + f"{'yes' if same else 'NO':>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Accuracy delta and throughput of the int8 TFLite variants against float32.
+
+Compares the float TFLite export with the int8_dynamic and int8 files from
+quantize_models.py on held-out samples (rows after the calibration set).
+Word models are scored by exact match and character error rate of the greedy
+CTC decode, the character model by label accuracy. Agreement is how often a
+variant's prediction equals the float prediction.
+
+Run from the model folder:
+    python -m benchmarks.eval_quantized handwriting_model.h5 --words-csv images/written_name_test_v2.csv \\
+        --words-folder images/test_v2/test
+    python -m benchmarks.eval_quantized recognition_model_3.h5 --chars-csv english.csv
+"""
+import argparse
+import os
+import time
+import joblib
+import numpy as np
+from ctc_decoder import greedy_decode
+from inference_backend import TFLiteBackend, exported_path
+from model_registry import MODEL_SPECS
+from quantize_models import load_char_images, load_word_images
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ-' "
+
+def edit_distance(a, b):
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (ca != cb))
+    return row[-1]
+
+def char_error_rate(predictions, labels):
+    errors = sum(edit_distance(p, t) for p, t in zip(predictions, labels))
+    return errors / max(sum(len(t) for t in labels), 1)
+
+def run(model, images, repeats):
+    model.predict_on_batch(images[:1])  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = model.predict_on_batch(images)
+        timings.append(time.perf_counter() - start)
+    return output, len(images) / min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model", help="h5 file whose TFLite variants are evaluated")
+    parser.add_argument("--words-csv")
+    parser.add_argument("--words-folder")
+    parser.add_argument("--chars-csv")
+    parser.add_argument("--label-encoder", help="defaults to the one in MODEL_SPECS")
+    parser.add_argument("--samples", type=int, default=512)
+    parser.add_argument("--skip", type=int, default=256, help="rows used for calibration, excluded from the eval")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.words_csv:
+        images, labels = load_word_images(args.words_csv, args.words_folder, args.samples, args.skip)
+        decode = lambda output: greedy_decode(output, ALPHABET)
+    elif args.chars_csv:
+        images, labels = load_char_images(args.chars_csv, args.samples, args.skip)
+        encoder_path = args.label_encoder or MODEL_SPECS[args.model]["label_encoder"]
+        classes = np.asarray(joblib.load(encoder_path).classes_)
+        decode = lambda output: [str(c) for c in classes[output.argmax(axis=1)]]
+    else:
+        parser.error("one of --words-csv or --chars-csv is required")
+    if not len(images):
+        raise SystemExit("No evaluation images found")
+
+    results = {}
+    for variant in ("", "int8_dynamic", "int8"):
+        path = exported_path(args.model, "tflite", variant)
+        if not os.path.exists(path):
+            print(f"{path}: missing, skipped")
+            continue
+        output, throughput = run(TFLiteBackend(path), images, args.repeats)
+        results[variant or "float32"] = (decode(output), throughput, os.path.getsize(path))
+
+    reference = results.get("float32")
+    print(f"{len(images)} samples")
+    print(f"{'variant':<14}{'MB':>6}{'accuracy':>10}{'CER':>8}{'agree':>8}{'img/s':>9}{'speedup':>9}")
+    for variant, (predictions, throughput, size) in results.items():
+        accuracy = np.mean([p == t for p, t in zip(predictions, labels)])
+        cer = char_error_rate(predictions, labels) if args.words_csv else float("nan")
+        agree = np.mean([p == r for p, r in zip(predictions, reference[0])]) if reference else float("nan")
+        speedup = throughput / reference[1] if reference else float("nan")
+        print(f"{variant:<14}{size / 1e6:>6.1f}{accuracy:>10.3f}{cer:>8.3f}{agree:>8.3f}{throughput:>9.0f}{speedup:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""CPU-bound steps of the /process pipeline, run in asgi_app.py's process pool.
+
+Workers are spawned, not forked, and this module only pulls in OpenCV and
+NumPy code, so a worker starts fast and never loads a model.
+"""
+from pdf_builder import numbered_pages_pdf
+from recognition import preprocess_batch
+from request_io import decode_image
+from segmentation import word_segmentation
+
+def ping():
+    return True
+
+def segment_upload(data):
+    """Decode an upload and return its preprocessed (N, 256, 64, 1) word batch."""
+    image = decode_image(data)
+    if image is None:
+        raise ValueError("Cannot decode image")
+    processed_img, word_boxes = word_segmentation(image)
+    return preprocess_batch([processed_img[y1:y2, x1:x2] for x1, y1, x2, y2 in word_boxes])
+
+def render_pdf(pages):
+    return numbered_pages_pdf(pages)
@@ -0,0 +1,57 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+MAX_BYTES = int(os.environ.get("WORD_CACHE_BYTES", 64 * 1024 * 1024))
+
+
+class CropCache:
+    """LRU cache of model outputs keyed by the hash of a preprocessed crop.
+
+    Keys are an exact BLAKE2 digest of the model input, so a hit always
+    returns what the model would have produced for that crop. Entries are
+    evicted least recently used first once their outputs exceed `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(crop):
+        return hashlib.blake2b(crop.tobytes(), digest_size=16).digest()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key).nbytes
+            self._entries[key] = value
+            self._bytes += value.nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                self._bytes -= self._entries.popitem(last=False)[1].nbytes
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,65 @@
+from collections import defaultdict
+import numpy as np
+
+# Pure-NumPy CTC decoding for (N, T, C) softmax outputs. The blank label is
+# the last class (C - 1), matching K.ctc_decode.
+
+def build_lookup(alphabet, num_classes=None):
+    """Return an array mapping class index to character, blank mapped to ''."""
+    num_classes = num_classes or len(alphabet) + 1
+    lookup = np.full(num_classes, '', dtype=object)
+    lookup[:len(alphabet)] = list(alphabet)
+    return lookup
+
+def greedy_decode(prediction, alphabet, lookup=None):
+    """Best-path decode a whole batch with array ops, one string per row."""
+    prediction = np.asarray(prediction)
+    blank = prediction.shape[2] - 1
+    if lookup is None:
+        lookup = build_lookup(alphabet, prediction.shape[2])
+
+    best = prediction.argmax(axis=2)
+    # Keep a label if it is not blank and differs from the previous step
+    keep = best != blank
+    keep[:, 1:] &= best[:, 1:] != best[:, :-1]
+    return [''.join(lookup[row[mask]]) for row, mask in zip(best, keep)]
+
+def _beam_search_row(probs, blank, beam_width, prune):
+    # Prefix beam search: each prefix tracks (p_blank, p_non_blank)
+    beams = {(): (1.0, 0.0)}
+    for p in probs:
+        candidates = np.flatnonzero(p >= min(prune, p.max()))
+        next_beams = defaultdict(lambda: [0.0, 0.0])
+        for prefix, (pb, pnb) in beams.items():
+            for c in candidates:
+                pc = p[c]
+                if c == blank:
+                    next_beams[prefix][0] += (pb + pnb) * pc
+                    continue
+                extended = next_beams[prefix + (c,)]
+                if prefix and prefix[-1] == c:
+                    # A repeat only extends the prefix across a blank
+                    extended[1] += pb * pc
+                    next_beams[prefix][1] += pnb * pc
+                else:
+                    extended[1] += (pb + pnb) * pc
+        ranked = sorted(next_beams.items(), key=lambda kv: kv[1][0] + kv[1][1], reverse=True)[:beam_width]
+        # Renormalise so long sequences do not underflow
+        total = sum(pb + pnb for _, (pb, pnb) in ranked) or 1.0
+        beams = {prefix: (pb / total, pnb / total) for prefix, (pb, pnb) in ranked}
+    return max(beams.items(), key=lambda kv: kv[1][0] + kv[1][1])[0]
+
+def beam_search_decode(prediction, alphabet, beam_width=10, prune=1e-3, lookup=None):
+    """Prefix beam search decode, slower than greedy but can recover better paths."""
+    prediction = np.asarray(prediction)
+    blank = prediction.shape[2] - 1
+    if lookup is None:
+        lookup = build_lookup(alphabet, prediction.shape[2])
+    return [''.join(lookup[list(_beam_search_row(row, blank, beam_width, prune))]) for row in prediction]
+
+def decode(prediction, alphabet, mode="greedy", beam_width=10, lookup=None):
+    if mode == "greedy":
+        return greedy_decode(prediction, alphabet, lookup)
+    if mode == "beam":
+        return beam_search_decode(prediction, alphabet, beam_width, lookup=lookup)
+    raise ValueError(f"Unknown CTC decode mode: {mode}")
@@ -0,0 +1,51 @@
+"""Export the Keras .h5 models to TFLite and/or ONNX for inference_backend.py.
+
+Run from the model folder:
+    python export_models.py --format tflite onnx
+    python export_models.py handwriting_model.h5 --format tflite --tflite-batch-size 32
+"""
+import argparse
+import os
+import tensorflow as tf
+from inference_backend import exported_path
+from model_registry import MODEL_SPECS
+
+def load_keras(model_path):
+    return tf.keras.models.load_model(model_path, compile=False)
+
+def tflite_converter(model, batch_size):
+    # The bidirectional LSTMs only lower to TFLite ops with a static batch size
+    inputs = tf.keras.Input(shape=model.input_shape[1:], batch_size=batch_size)
+    fixed = tf.keras.Model(inputs, model(inputs))
+    return tf.lite.TFLiteConverter.from_keras_model(fixed)
+
+def export_tflite(model, output_path, batch_size):
+    with open(output_path, "wb") as f:
+        f.write(tflite_converter(model, batch_size).convert())
+
+def export_onnx(model, output_path):
+    import tf2onnx
+    spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, output_path=output_path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("models", nargs="*", help="h5 files (default: every model in MODEL_SPECS that exists)")
+    parser.add_argument("--format", nargs="+", choices=["tflite", "onnx"], default=["tflite", "onnx"])
+    parser.add_argument("--tflite-batch-size", type=int, default=16,
+                        help="static batch size of the TFLite graph; smaller batches are padded")
+    args = parser.parse_args()
+
+    models = args.models or [name for name in MODEL_SPECS if os.path.exists(name)]
+    for model_path in models:
+        model = load_keras(model_path)
+        for fmt in args.format:
+            output_path = exported_path(model_path, fmt)
+            if fmt == "tflite":
+                export_tflite(model, output_path, args.tflite_batch_size)
+            else:
+                export_onnx(model, output_path)
+            print(f"{model_path} -> {output_path} ({os.path.getsize(output_path) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,47 @@
-import os
 import cv2 as cv
-import matplotlib.pyplot as plt
-import numpy as np
-import joblib
-from tensorflow.keras.models import load_model
 from flask import Flask, request, jsonify
+from recognition import build_label_lookup, classify_characters, predict_in_chunks
+from inference_scheduler import BatchScheduler, MAX_BATCH_SIZE
+from request_io import read_image
+from model_registry import registry
+from metrics import instrument_app, timer
 
 app = Flask(__name__)
+instrument_app(app)
 
-# Load the trained model and label encoder
-model = load_model('recognition_model_3.h5')
-le = joblib.load('label_encoder_3.pkl')
+MODEL_PATH = 'recognition_model_3.h5'
 
-def load_and_preprocess_image(image_path):
-    img = cv.imread(image_path, cv.IMREAD_GRAYSCALE).astype('float32')
-    img = cv.resize(img, (64, 64)) / 255.0
-    img = np.expand_dims(img, axis=0)  # Add batch dimension
-    img = np.expand_dims(img, axis=-1)  # Add channel dimension
-    return img
+# Load the trained model and label encoder in the background
+registry.warm_up_async([MODEL_PATH])
+
+# Characters from concurrent requests share predict calls
+scheduler = BatchScheduler(lambda batch: predict_in_chunks(registry.get_model(MODEL_PATH), batch, MAX_BATCH_SIZE))
 
 @app.route('/predict', methods=['POST'])
 def predict():
     if 'image' not in request.files:
         return jsonify({'error': 'No image provided'}), 400
 
-    image_file = request.files['image']
-    image_path = 'temp_image.png'
-    image_file.save(image_path)
-
     # Preprocess and predict
-    test_image = load_and_preprocess_image(image_path)
-    prediction = model.predict(test_image)
-    predicted_label_index = np.argmax(prediction)
-    predicted_label = le.inverse_transform([predicted_label_index])[0]
-
-    # Remove the temporary image file
-    os.remove(image_path)
-
-    return jsonify({'predicted_label': predicted_label})
+    with timer('read_image'):
+        test_image = read_image(request.files['image'], cv.IMREAD_GRAYSCALE)
+    if test_image is None:
+        return jsonify({'error': 'Cannot decode image'}), 400
+    test_image = test_image.astype('float32')
+    labels = build_label_lookup(registry.get_label_encoder(MODEL_PATH))
+    with timer('classify'):
+        predicted, confidences = classify_characters([test_image], scheduler, labels)
+
+    return jsonify({'predicted_label': predicted[0], 'confidence': float(confidences[0])})
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    body, status = registry.health()
+    return jsonify(body), status
+
+@app.route('/scheduler_stats', methods=['GET'])
+def scheduler_stats():
+    return jsonify(scheduler.stats())
 
 if __name__ == '__main__':
     app.run(debug=True)
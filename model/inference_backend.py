@@ -0,0 +1,89 @@
+import os
+import threading
+import numpy as np
+
+# Runtime used to serve the models: keras (.h5), tflite or onnx. The lighter
+# runtimes read the files written next to the .h5 by export_models.py and
+# never import TensorFlow.
+BACKEND = os.environ.get("INFERENCE_BACKEND", "keras")
+# Quantized TFLite variant written by quantize_models.py: int8_dynamic
+# (int8 weights) or int8 (full integer); empty for the float32 export
+VARIANT = os.environ.get("MODEL_VARIANT", "")
+EXTENSIONS = {"tflite": ".tflite", "onnx": ".onnx"}
+VARIANTS = ("", "int8_dynamic", "int8")
+
+def exported_path(model_path, backend, variant=""):
+    suffix = f"_{variant}" if variant else ""
+    return os.path.splitext(model_path)[0] + suffix + EXTENSIONS[backend]
+
+def served_path(model_path, backend=BACKEND, variant=VARIANT):
+    """The file load_backend() reads for `model_path`: the .h5 itself or its export."""
+    return model_path if backend == "keras" else exported_path(model_path, backend, variant)
+
+
+class KerasBackend:
+    def __init__(self, path):
+        from tensorflow.keras.models import load_model
+        self.model = load_model(path, compile=False)
+
+    def predict_on_batch(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class TFLiteBackend:
+    """Runs a .tflite model exported with a fixed batch size.
+
+    Inputs are fed in chunks of that size and the last chunk is zero
+    padded. The interpreter is not thread safe, so calls are serialized.
+    """
+
+    def __init__(self, path):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            from tflite_runtime.interpreter import Interpreter
+        self.interpreter = Interpreter(model_path=path)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch_size = int(self.input["shape"][0])
+        self._lock = threading.Lock()
+
+    def predict_on_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        outputs = []
+        with self._lock:
+            for start in range(0, len(batch), self.batch_size):
+                chunk = batch[start:start + self.batch_size]
+                rows = len(chunk)
+                if rows < self.batch_size:
+                    chunk = np.concatenate([chunk, np.zeros((self.batch_size - rows,) + chunk.shape[1:], chunk.dtype)])
+                self.interpreter.set_tensor(self.input["index"], chunk)
+                self.interpreter.invoke()
+                outputs.append(self.interpreter.get_tensor(self.output["index"])[:rows])
+        return np.concatenate(outputs, axis=0)
+
+
+class OnnxBackend:
+    def __init__(self, path):
+        import onnxruntime
+        self.session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_on_batch(self, batch):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+BACKENDS = {"keras": KerasBackend, "tflite": TFLiteBackend, "onnx": OnnxBackend}
+
+def load_backend(model_path, backend=BACKEND, variant=VARIANT):
+    """Load the model at `model_path` (an .h5 file) with the given runtime."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown model variant: {variant}")
+    if variant and backend != "tflite":
+        raise ValueError(f"Model variant {variant} requires the tflite backend")
+    if backend == "keras":
+        return KerasBackend(model_path)
+    return BACKENDS[backend](served_path(model_path, backend, variant))
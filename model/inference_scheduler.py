@@ -0,0 +1,117 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+MAX_BATCH_SIZE = int(os.environ.get("INFERENCE_MAX_BATCH", 64))
+MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", 5))
+
+
+class BatchScheduler:
+    """Micro-batches predict calls coming from concurrent requests.
+
+    Handlers call `predict_on_batch()` (so the scheduler can stand in for a
+    Keras model). Inputs are queued, merged into one batch of at most
+    `max_batch_size` rows once that many are waiting or `max_wait_ms` has
+    passed since the first one arrived (larger inputs are split across
+    batches), run through `predict_fn` on a single worker thread, and the output rows
+    are handed back to each caller.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        # (request, first row) of a request cut at the end of the last batch
+        self._pending = None
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._requests = 0
+        self._last_batch_size = 0
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, inputs):
+        future = Future()
+        self._queue.put((np.asarray(inputs), future, []))
+        return future
+
+    def predict_on_batch(self, inputs):
+        return self.submit(inputs).result()
+
+    def _collect(self):
+        """Queued requests as (request, start, stop) row slices of at most max_batch_size rows in all.
+
+        A request that does not fit in the batch is cut at the limit and the
+        rest of it opens the next batch.
+        """
+        slices = []
+        rows = 0
+        deadline = None
+        while rows < self.max_batch_size:
+            if self._pending is not None:
+                (request, start), self._pending = self._pending, None
+                if request[1].done():  # an earlier part of it failed
+                    continue
+            else:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    break
+                try:
+                    request, start = self._queue.get(timeout=timeout), 0
+                except queue.Empty:
+                    break
+            if deadline is None:
+                deadline = time.monotonic() + self.max_wait
+            stop = min(len(request[0]), start + self.max_batch_size - rows)
+            slices.append((request, start, stop))
+            rows += stop - start
+            if stop < len(request[0]):
+                self._pending = (request, stop)
+        return slices, rows
+
+    def _run(self):
+        while True:
+            slices, rows = self._collect()
+            try:
+                outputs = self.predict_fn(np.concatenate([inputs[start:stop] for (inputs, _, _), start, stop in slices],
+                                                         axis=0))
+            except Exception as e:
+                for (_, future, _), _, _ in slices:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            finished = 0
+            for (inputs, future, parts), start, stop in slices:
+                parts.append(outputs[offset:offset + stop - start])
+                offset += stop - start
+                if stop == len(inputs):
+                    future.set_result(parts[0] if len(parts) == 1 else np.concatenate(parts, axis=0))
+                    finished += 1
+
+            with self._stats_lock:
+                self._batches += 1
+                self._rows += rows
+                self._requests += finished
+                self._last_batch_size = rows
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": batches,
+                "rows": self._rows,
+                "requests": self._requests,
+                "last_batch_size": self._last_batch_size,
+                "mean_batch_size": self._rows / batches if batches else 0.0,
+                "mean_batch_fill": self._rows / (batches * self.max_batch_size) if batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
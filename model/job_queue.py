@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# SQLite database holding queued jobs, their results and PDFs. A file, so
+# every process of a multi-process server and extra worker processes
+# (job_worker.py) share one queue and a poll finds the job wherever it was
+# submitted. ":memory:" gives each process a queue of its own.
+DB_PATH = os.environ.get("JOB_DB", "jobs.sqlite3")
+WORKERS = int(os.environ.get("JOB_WORKERS", 1))
+# Queued jobs beyond this are refused so a backlog cannot grow without bound
+MAX_QUEUED = int(os.environ.get("JOB_MAX_QUEUED", 100))
+# Finished jobs (and their PDFs) are deleted after this many seconds
+TTL_S = float(os.environ.get("JOB_TTL_S", 3600))
+# A running job not updated for this long is assumed lost and handed out again
+LEASE_S = float(os.environ.get("JOB_LEASE_S", 600))
+MAX_ATTEMPTS = 3
+
+logger = logging.getLogger(__name__)
+# Comma-separated hosts (host or host:port) that callback URLs may point at.
+# Empty disables callbacks, so clients cannot make the server call
+# arbitrary, possibly internal, addresses
+CALLBACK_HOSTS = {host.strip().lower() for host in os.environ.get("JOB_CALLBACK_HOSTS", "").split(",") if host.strip()}
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect could lead a callback past the host allowlist
+    def redirect_request(self, *args):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+def check_callback_url(url, allowed_hosts=CALLBACK_HOSTS):
+    """Raise ValueError unless url is http(s) on an allowed host."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback_url must be an http or https URL")
+    host = parts.hostname.lower()
+    if host not in allowed_hosts and parts.netloc.lower().rpartition("@")[2] not in allowed_hosts:
+        raise ValueError("callback_url host is not allowed")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """Durable submit/poll queue executed by a pool of worker threads.
+
+    `process(data, progress)` receives the uploaded bytes and a
+    `progress(stage, fraction)` callback, and returns `(result, pdf_bytes)`
+    where result is JSON-serializable. Jobs are claimed in a write
+    transaction, so any number of threads and processes can work the same
+    database. When a job finishes and has a callback URL, its status is
+    POSTed there as JSON from a separate thread, so a slow receiver does
+    not hold up the workers.
+    """
+
+    def __init__(self, process, db_path=DB_PATH, workers=WORKERS, max_queued=MAX_QUEUED, ttl_s=TTL_S,
+                 lease_s=LEASE_S, callback_hosts=CALLBACK_HOSTS):
+        self.process = process
+        self.callback_hosts = callback_hosts
+        self.max_queued = max_queued
+        self.ttl_s = ttl_s
+        self.lease_s = lease_s
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT, stage TEXT, progress REAL, "
+            "created REAL, updated REAL, attempts INTEGER, input BLOB, callback_url TEXT, result TEXT, "
+            "pdf BLOB, error TEXT)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+        self._lock = threading.Lock()
+        self._callbacks = ThreadPoolExecutor(1, thread_name_prefix="job-callback")
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self.work, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, data, callback_url=None):
+        """Queue a job and return its id. Raises ValueError for a callback_url
+        that is not allowed and QueueFull when the queue is full."""
+        if callback_url:
+            check_callback_url(callback_url, self.callback_hosts)
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                             (now - self.ttl_s,))
+            queued = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFull()
+            self._db.execute(
+                "INSERT INTO jobs (id, status, stage, progress, created, updated, attempts, input, callback_url) "
+                "VALUES (?, 'queued', 'queued', 0, ?, ?, 0, ?, ?)", (job_id, now, now, data, callback_url))
+        self._wakeup.set()
+        return job_id
+
+    def status(self, job_id):
+        """Job status without the input and PDF blobs, or None if unknown."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, stage, progress, created, updated, result, error, pdf IS NOT NULL, "
+                "(SELECT COUNT(*) FROM jobs AS q WHERE q.status = 'queued' AND q.created < jobs.created) "
+                "FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        status, stage, progress, created, updated, result, error, has_pdf, ahead = row
+        job = {"job_id": job_id, "status": status, "stage": stage, "progress": progress,
+               "created": created, "updated": updated, "has_pdf": bool(has_pdf)}
+        if status == "queued":
+            job["queue_position"] = ahead
+        if result is not None:
+            job["result"] = json.loads(result)
+        if error is not None:
+            job["error"] = error
+        return job
+
+    def pdf(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT pdf FROM jobs WHERE id = ? AND status = 'done'", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"counts": counts, "workers": len(self._threads), "max_queued": self.max_queued}
+
+    def _claim(self):
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id, input, attempts FROM jobs WHERE status = 'queued' "
+                    "OR (status = 'running' AND updated < ?) ORDER BY created LIMIT 1",
+                    (now - self.lease_s,)).fetchone()
+                if row is not None:
+                    job_id, data, attempts = row
+                    if attempts >= MAX_ATTEMPTS:
+                        self._db.execute("UPDATE jobs SET status = 'failed', error = ?, input = NULL, updated = ? "
+                                         "WHERE id = ?", ("Worker lost the job too many times", now, job_id))
+                        row = None
+                    else:
+                        self._db.execute("UPDATE jobs SET status = 'running', stage = 'started', updated = ?, "
+                                         "attempts = attempts + 1 WHERE id = ?", (now, job_id))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return row[:2] if row else None
+
+    def _update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def run_one(self):
+        """Claim and run the oldest job. Returns False when the queue is empty."""
+        claimed = self._claim()
+        if claimed is None:
+            return False
+        job_id, data = claimed
+
+        def progress(stage, fraction):
+            self._update(job_id, stage=stage, progress=fraction)
+
+        try:
+            result, pdf_bytes = self.process(data, progress)
+            fields = dict(status="done", stage="done", progress=1.0, result=json.dumps(result), pdf=pdf_bytes,
+                          input=None)
+        except Exception as e:
+            fields = dict(status="failed", stage="failed", error=str(e), input=None)
+        try:
+            self._update(job_id, **fields)
+        except Exception as e:
+            # Fail the job rather than leave it running until its lease expires
+            logger.exception("Cannot store the result of job %s", job_id)
+            self._update(job_id, status="failed", stage="failed", error=f"Cannot store result: {e}", input=None)
+        self._notify(job_id)
+        return True
+
+    def _notify(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT callback_url FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row or not row[0]:
+            return
+        body = json.dumps(self.status(job_id)).encode()
+        request = urllib.request.Request(row[0], data=body, headers={"Content-Type": "application/json"})
+        self._callbacks.submit(_post_callback, request)
+
+    def work(self):
+        while not self._stop.is_set():
+            try:
+                busy = self.run_one()
+            except Exception:
+                # e.g. "database is locked" while other processes hold it. A
+                # claimed job is handed out again once its lease expires
+                logger.exception("Job worker error")
+                busy = False
+            if not busy:
+                # Woken at once by local submits, every second for other processes
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+
+def _post_callback(request):
+    try:
+        _callback_opener.open(request, timeout=10).close()
+    except OSError:
+        pass  # Best effort: the client can still poll
@@ -0,0 +1,25 @@
+"""Extra worker process for the /jobs queue of latest.py.
+
+    python latest.py
+    JOB_WORKERS=2 python job_worker.py
+
+Workers claim jobs from the shared SQLite file (JOB_DB, the same for both),
+so pages keep being processed while the web process only accepts uploads
+and answers polls.
+"""
+import sys
+import time
+from job_queue import DB_PATH
+
+if DB_PATH in ("", ":memory:"):
+    sys.exit("Set JOB_DB to the database file used by the server")
+
+from latest import jobs
+
+if __name__ == "__main__":
+    print(f"Working {DB_PATH} with {len(jobs._threads)} threads")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        jobs.stop()
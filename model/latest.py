@@ -1,111 +1,143 @@
 import os
+import io
+import uuid
 import cv2
 import numpy as np
-import joblib
-from tensorflow.keras.models import load_model
-from flask import Flask, request, jsonify
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
+from flask import Flask, request, jsonify, url_for
+from segmentation import word_segmentation, segmentation_params
+from result_cache import ResultCache, make_key, model_version
+from crop_cache import CropCache
+from model_registry import registry
+from recognition import build_label_lookup, classify_characters
+from request_io import decode_image, encode_pdf, pdf_response
+from job_queue import JobQueue, QueueFull
+from metrics import instrument_app, timed, timer, count_items
 
 app = Flask(__name__)
+instrument_app(app)
 
 UPLOAD_FOLDER = './uploads'
 WORD_FOLDER = './segmented_words'
 CHAR_FOLDER = './segmented_chars'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(WORD_FOLDER, exist_ok=True)
-os.makedirs(CHAR_FOLDER, exist_ok=True)
 
-model = load_model('recognition_model_3.h5')
-le = joblib.load('label_encoder_3.pkl')
-
-def segment_words(image_path):
-    img = cv2.imread(image_path)
-    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-    h, w, c = img.shape
-    if w > 1000:
-        new_w = 1000
-        ar = w / h
-        new_h = int(new_w / ar)
-        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
-
-    img_gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-    _, thresh = cv2.threshold(img_gray, 80, 255, cv2.THRESH_BINARY_INV)
-
-    kernel_line = np.ones((3, 85), np.uint8)
-    dilated_line = cv2.dilate(thresh, kernel_line, iterations=1)
-    contours_line, _ = cv2.findContours(dilated_line, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-    sorted_lines = sorted(contours_line, key=lambda ctr: cv2.boundingRect(ctr)[1])
-
-    kernel_word = np.ones((3, 15), np.uint8)
-    dilated_word = cv2.dilate(thresh, kernel_word, iterations=1)
-
-    word_paths = []
-    word_index = 1
-
-    for line in sorted_lines:
-        x, y, w, h = cv2.boundingRect(line)
-        roi_line = dilated_word[y:y + h, x:x + w]
-
-        contours_word, _ = cv2.findContours(roi_line, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
-        sorted_words = sorted(contours_word, key=lambda c: cv2.boundingRect(c)[0])
-
-        for word in sorted_words:
-            if cv2.contourArea(word) < 400:
-                continue
-
-            x2, y2, w2, h2 = cv2.boundingRect(word)
-            word_img = img[y + y2:y + y2 + h2, x + x2:x + x2 + w2]
-            word_path = os.path.join(WORD_FOLDER, f'word_{word_index}.png')
+# Crops flow through memory; set LATEST_DEBUG_DUMP=1 to also write the upload,
+# word and character images to the folders above for inspection
+DEBUG_DUMP = os.environ.get('LATEST_DEBUG_DUMP') == '1'
+if DEBUG_DUMP:
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    os.makedirs(WORD_FOLDER, exist_ok=True)
+    os.makedirs(CHAR_FOLDER, exist_ok=True)
+
+MODEL_PATH = 'recognition_model_3.h5'
+# Load the model in the background so the worker starts serving right away
+registry.warm_up_async([MODEL_PATH])
+BATCH_SIZE = int(os.environ.get('RECOGNITION_BATCH_SIZE', 64))
+
+# Results of repeated uploads are served from cache
+result_cache = ResultCache()
+CACHE_VERSION = model_version(registry.served_path(MODEL_PATH)) + model_version('label_encoder_3.pkl')
+# Repeated character crops skip inference
+char_cache = CropCache()
+
+# Return the word crops of an RGB page as views into the page. request_id
+# only prefixes the debug dump file names.
+@timed('segment_words')
+def segment_words(img, request_id=''):
+    img, word_boxes = word_segmentation(img, gray_code=cv2.COLOR_RGB2GRAY)
+    word_imgs = [img[y1:y2, x1:x2] for x1, y1, x2, y2 in word_boxes]
+
+    if DEBUG_DUMP:
+        for word_index, word_img in enumerate(word_imgs, 1):
+            word_path = os.path.join(WORD_FOLDER, f'{request_id}word_{word_index}.png')
             cv2.imwrite(word_path, cv2.cvtColor(word_img, cv2.COLOR_RGB2BGR))
-            word_paths.append(word_path)
-            word_index += 1
 
-    return word_paths
+    return word_imgs
 
-def segment_characters(image_path, word_index):
-    img = cv2.imread(image_path)
-    img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+# Return the 64x64 binarized character crops of an RGB word crop
+def segment_characters(word_img, word_index, request_id=''):
+    img_gray = cv2.cvtColor(word_img, cv2.COLOR_RGB2GRAY)
     _, thresh = cv2.threshold(img_gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
 
     contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     char_bboxes = [cv2.boundingRect(c) for c in contours]
     char_bboxes = sorted(char_bboxes, key=lambda x: x[0])
 
-    char_paths = []
+    char_imgs = []
     for idx, (x, y, w, h) in enumerate(char_bboxes):
         if w > 5 and h > 10:
-            char_img = thresh[y:y + h, x:x + w]
-            char_img = cv2.resize(char_img, (64, 64))
-            char_path = os.path.join(CHAR_FOLDER, f'word_{word_index}_char_{idx}.png')
-            cv2.imwrite(char_path, char_img)
-            char_paths.append(char_path)
-
-    return char_paths
-
-def load_and_preprocess_image(image_path):
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE).astype('float32')
-    img = cv2.resize(img, (64, 64)) / 255.0
-    img = np.expand_dims(img, axis=0)
-    img = np.expand_dims(img, axis=-1)
-    return img
-
-def predict_character(image_path):
-    img = load_and_preprocess_image(image_path)
-    prediction = model.predict(img)
-    predicted_label_index = np.argmax(prediction)
-    predicted_label = le.inverse_transform([predicted_label_index])[0]
-    return predicted_label
-
-def create_pdf(text, pdf_path='recognized_text.pdf'):
-    doc = SimpleDocTemplate(pdf_path, pagesize=A4)
+            char_img = cv2.resize(thresh[y:y + h, x:x + w], (64, 64))
+            if DEBUG_DUMP:
+                cv2.imwrite(os.path.join(CHAR_FOLDER, f'{request_id}word_{word_index}_char_{idx}.png'), char_img)
+            char_imgs.append(char_img)
+
+    return char_imgs
+
+# Classify every character of a page in one batch, then regroup them by word
+@timed('classify')
+def recognize_words(char_imgs_per_word):
+    char_imgs = [char_img for char_imgs in char_imgs_per_word for char_img in char_imgs]
+    stats = {}
+    labels = build_label_lookup(registry.get_label_encoder(MODEL_PATH))
+    predicted, confidences = classify_characters(char_imgs, registry.get_model(MODEL_PATH), labels, BATCH_SIZE,
+                                                 cache=char_cache, stats=stats)
+    bounds = np.cumsum([0] + [len(char_imgs) for char_imgs in char_imgs_per_word])
+    words = ["".join(predicted[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+    word_confidences = [confidences[start:end].tolist() for start, end in zip(bounds[:-1], bounds[1:])]
+    hit_rate = stats['hits'] / stats['lookups'] if stats.get('lookups') else 0.0
+    return words, word_confidences, hit_rate
+
+# Build the PDF in memory and return its bytes
+@timed('pdf')
+def create_pdf(text):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
     story = []
     style = getSampleStyleSheet()["BodyText"]
     story.append(Paragraph(text, style))
     story.append(Spacer(1, 12))
     doc.build(story)
+    return buffer.getvalue()
+
+# Run the whole pipeline on the bytes of an uploaded image and return the
+# JSON result and the PDF. progress(stage, fraction) reports job status.
+def recognize_upload(data, request_id='', progress=None):
+    progress = progress or (lambda stage, fraction: None)
+    with timer('read_image'):
+        img = decode_image(data)
+        if img is None:
+            raise ValueError('Cannot decode image')
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    key = make_key(img, CACHE_VERSION, segmentation_params())
+    cached = result_cache.get(key)
+    char_hit_rate = None
+    if cached is None:
+        progress('segmenting', 0.1)
+        word_imgs = segment_words(img, request_id)
+        with timer('segment_characters'):
+            char_imgs_per_word = [segment_characters(word_img, idx, request_id) for idx, word_img in enumerate(word_imgs, 1)]
+        count_items('words', len(word_imgs))
+        count_items('characters', sum(len(char_imgs) for char_imgs in char_imgs_per_word))
+        progress('classifying', 0.5)
+        words, confidences, char_hit_rate = recognize_words(char_imgs_per_word)
+        result_cache.put(key, {'words': words, 'confidences': confidences})
+    else:
+        words, confidences = cached['words'], cached['confidences']
+    recognized_text = "".join(word + " " for word in words)
+
+    progress('pdf', 0.9)
+    pdf_bytes = create_pdf(recognized_text.strip())
+    return {'recognized_text': recognized_text, 'confidences': confidences,
+            'char_cache_hit_rate': char_hit_rate}, pdf_bytes
+
+def save_upload(image, data):
+    request_id = uuid.uuid4().hex[:12] + '_'
+    if DEBUG_DUMP:
+        with open(os.path.join(UPLOAD_FOLDER, request_id + os.path.basename(image.filename)), 'wb') as f:
+            f.write(data)
+    return request_id
 
 @app.route('/segment_and_recognize', methods=['POST'])
 def segment_and_recognize():
@@ -113,20 +145,64 @@ def segment_and_recognize():
         return jsonify({'error': 'No image provided'}), 400
 
     image = request.files['image']
-    image_path = os.path.join(UPLOAD_FOLDER, image.filename)
-    image.save(image_path)
-
-    word_paths = segment_words(image_path)
-    recognized_text = ""
-
-    for idx, word_path in enumerate(word_paths, 1):
-        char_paths = segment_characters(word_path, idx)
-        word = "".join(predict_character(char_path) for char_path in char_paths)
-        recognized_text += word + " "
-
-    create_pdf(recognized_text.strip())
+    data = image.read()
+    try:
+        result, pdf_bytes = recognize_upload(data, save_upload(image, data))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(dict(result, pdf_base64=encode_pdf(pdf_bytes)))
+
+# Large photos time out on mobile when processed inline: POST /jobs returns
+# a job id at once and the client polls GET /jobs/<id>, then fetches the PDF
+jobs = JobQueue(lambda data, progress: recognize_upload(data, uuid.uuid4().hex[:12] + '_', progress))
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image provided'}), 400
 
-    return jsonify({'recognized_text': recognized_text, 'pdf_path': 'recognized_text.pdf'})
+    image = request.files['image']
+    data = image.read()
+    save_upload(image, data)
+    try:
+        job_id = jobs.submit(data, request.form.get('callback_url'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except QueueFull:
+        return jsonify({'error': 'Too many queued jobs, retry later'}), 503, {'Retry-After': '5'}
+    return jsonify({'job_id': job_id, 'status': 'queued', 'status_url': url_for('job_status', job_id=job_id)}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job.pop('has_pdf'):
+        job['pdf_url'] = url_for('job_pdf', job_id=job_id)
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/pdf', methods=['GET'])
+def job_pdf(job_id):
+    pdf_bytes = jobs.pdf(job_id)
+    if pdf_bytes is None:
+        job = jobs.status(job_id)
+        if job is None:
+            return jsonify({'error': 'Unknown job'}), 404
+        return jsonify({'error': 'Job is ' + job['status']}), 409
+    return pdf_response(pdf_bytes, 'recognized_text.pdf')
+
+@app.route('/job_stats', methods=['GET'])
+def job_stats():
+    return jsonify(jobs.stats())
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    body, status = registry.health()
+    return jsonify(body), status
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify({'results': result_cache.stats(), 'characters': char_cache.stats()})
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,145 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Set METRICS_ENABLED=0 to turn every timer into a shared no-op and drop the
+# /metrics endpoint
+ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with one series per label tuple."""
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        for labels, counts, total in series:
+            pairs = [f'{name}="{value}"' for name, value in zip(self.labelnames, labels)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = ",".join(pairs + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{le}}} {cumulative}")
+            suffix = "{" + ",".join(pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram("handwriting_request_seconds", "Request latency by endpoint.",
+                            LATENCY_BUCKETS, ("endpoint",))
+STAGE_SECONDS = Histogram("handwriting_stage_seconds", "Latency of each pipeline stage.",
+                          LATENCY_BUCKETS, ("stage",))
+ITEMS_PER_REQUEST = Histogram("handwriting_items_per_request", "Words or characters recognized per request.",
+                              COUNT_BUCKETS, ("kind",))
+INFERENCE_BATCH_SIZE = Histogram("handwriting_inference_batch_size", "Rows per model predict call.",
+                                 COUNT_BUCKETS, ("model",))
+INFERENCE_SECONDS = Histogram("handwriting_inference_seconds", "Latency of each model predict call.",
+                              LATENCY_BUCKETS, ("model",))
+HISTOGRAMS = [REQUEST_SECONDS, STAGE_SECONDS, ITEMS_PER_REQUEST, INFERENCE_BATCH_SIZE, INFERENCE_SECONDS]
+
+_NULL_TIMER = nullcontext()
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+def timer(stage):
+    """Context manager that records the duration of a pipeline stage."""
+    return _Timer(STAGE_SECONDS, (stage,)) if ENABLED else _NULL_TIMER
+
+def timed(stage):
+    """Decorator form of timer(); returns the function unchanged when disabled."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        def wrapper(*args, **kwargs):
+            with _Timer(STAGE_SECONDS, (stage,)):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+    return decorate
+
+def count_items(kind, count):
+    if ENABLED:
+        ITEMS_PER_REQUEST.observe(count, kind)
+
+
+class InstrumentedModel:
+    """Records batch size and latency of every predict_on_batch call."""
+
+    def __init__(self, model, name):
+        self.model = model
+        self.name = name
+
+    def predict_on_batch(self, batch):
+        start = time.perf_counter()
+        output = self.model.predict_on_batch(batch)
+        INFERENCE_SECONDS.observe(time.perf_counter() - start, self.name)
+        INFERENCE_BATCH_SIZE.observe(len(batch), self.name)
+        return output
+
+def instrument_model(model, name):
+    return InstrumentedModel(model, name) if ENABLED else model
+
+def render():
+    return "\n".join(line for histogram in HISTOGRAMS for line in histogram.render()) + "\n"
+
+def instrument_app(app):
+    """Time every request by endpoint and serve the histograms on /metrics."""
+    if not ENABLED:
+        return
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        start = g.pop("metrics_start", None)
+        if start is not None and request.endpoint != "metrics":
+            REQUEST_SECONDS.observe(time.perf_counter() - start, request.endpoint or "unknown")
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
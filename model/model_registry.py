@@ -0,0 +1,98 @@
+import os
+import threading
+import numpy as np
+from inference_backend import load_backend, served_path, BACKEND, VARIANT
+from metrics import instrument_model
+
+# Models served by the apps, keyed by file name. input_shape is used to build
+# the dummy batch that traces the predict function during warm-up.
+MODEL_SPECS = {
+    "handwriting_model.h5": {"input_shape": (256, 64, 1)},
+    "handwriting_model_2.h5": {"input_shape": (256, 64, 1)},
+    "recognition_model_3.h5": {"input_shape": (64, 64, 1), "label_encoder": "label_encoder_3.pkl"},
+}
+# Set MODEL_LAZY_LOAD=1 to skip the background warm-up: workers report ready
+# immediately and each model is loaded by the first request that needs it
+LAZY_LOAD = os.environ.get("MODEL_LAZY_LOAD") == "1"
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded and warmed models.
+
+    Each model is deserialized once with the configured inference backend
+    and shared by every request handler in the process. `ready` only becomes
+    true after warm-up has finished, or immediately in lazy mode.
+    """
+
+    def __init__(self, specs=MODEL_SPECS, backend=BACKEND, variant=VARIANT, lazy=LAZY_LOAD):
+        self._specs = specs
+        self.backend = backend
+        self.variant = variant
+        self.lazy = lazy
+        self._models = {}
+        self._encoders = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.error = None
+
+    def _load(self, name):
+        spec = self._specs[name]
+        model = load_backend(name, self.backend, self.variant)
+        # Run one dummy batch so the predict graph is traced before real traffic
+        dummy = np.zeros((1,) + spec["input_shape"], dtype=np.float32)
+        model.predict_on_batch(dummy)
+        if "label_encoder" in spec:
+            import joblib
+            self._encoders[name] = joblib.load(spec["label_encoder"])
+        # Stored last: get_model() returns without the lock once the model is
+        # present, so the encoder must already be there
+        self._models[name] = instrument_model(model, name)
+
+    def get_model(self, name):
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                if name not in self._models:
+                    self._load(name)
+                model = self._models[name]
+        return model
+
+    def served_path(self, name):
+        """The file the model is loaded from with this registry's backend and variant."""
+        return served_path(name, self.backend, self.variant)
+
+    def get_label_encoder(self, name):
+        self.get_model(name)
+        return self._encoders[name]
+
+    def warm_up(self, names=None):
+        try:
+            for name in names or list(self._specs):
+                self.get_model(name)
+        except Exception as e:
+            self.error = str(e)
+            raise
+        self._ready.set()
+
+    def warm_up_async(self, names=None):
+        if self.lazy:
+            self._ready.set()
+            return None
+        thread = threading.Thread(target=self.warm_up, args=(names,), daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def health(self):
+        """(body, HTTP status) for the /healthz endpoints: 200 once ready, 503 while warming up or failed."""
+        if self.ready:
+            return {"status": "ready"}, 200
+        if self.error:
+            return {"status": "error", "error": self.error}, 503
+        return {"status": "warming_up"}, 503
+
+
+registry = ModelRegistry()
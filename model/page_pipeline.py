@@ -0,0 +1,67 @@
+"""Compute stages of the Combined.py Streamlit app as a StageGraph.
+
+    segmentation --> boxes ------------> annotated
+         |                                 ^
+         +-------> predictions ------------+
+                        |
+    diagrams -----------+--------------> pdf
+
+Diagram detection runs alongside segmentation and recognition, and the
+word boxes are drawn while the model predicts; only the text labels wait
+for the predictions.
+"""
+import io
+import cv2
+from pdf_builder import PDFBuilder
+from recognition import recognize_words
+from segmentation import word_segmentation
+from stage_graph import StageGraph
+
+# Detect diagrams and save them
+def extract_diagrams_and_boxes(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    edges = cv2.Canny(gray, threshold1=50, threshold2=150)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    cropped_boxes = []
+
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w > 50 and h > 50:
+            cropped_box = image[y:y+h, x:x+w]
+            cropped_boxes.append(cropped_box)
+
+    return cropped_boxes
+
+# Write predictions and drawings to a PDF path or file-like object
+def save_to_pdf(predictions, drawings, output):
+    builder = PDFBuilder()
+    builder.add_page_result(predictions, drawings)
+    return builder.output(output)
+
+def draw_boxes(processed_img, word_boxes):
+    img_with_boxes = processed_img.copy()
+    for x1, y1, x2, y2 in word_boxes:
+        cv2.rectangle(img_with_boxes, (x1, y1), (x2, y2), (255, 0, 0), 2)
+    return img_with_boxes
+
+def draw_labels(img_with_boxes, word_boxes, predictions):
+    for (x1, y1, _, _), predicted_text in zip(word_boxes, predictions):
+        cv2.putText(img_with_boxes, predicted_text, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    return img_with_boxes
+
+def page_graph(model, alphabet):
+    """StageGraph from the "image" input to diagrams, predictions, annotated image and pdf.
+
+    Seed "segmentation" ((page, word boxes)) and "predictions" in run()'s
+    inputs to skip those stages on a result cache hit.
+    """
+    graph = StageGraph()
+    graph.add("segmentation", word_segmentation, "image")
+    graph.add("diagrams", extract_diagrams_and_boxes, "image")
+    graph.add("predictions", lambda seg: recognize_words(seg[0], seg[1], model, alphabet), "segmentation")
+    graph.add("boxes", lambda seg: draw_boxes(*seg), "segmentation")
+    graph.add("annotated", lambda img, seg, predictions: draw_labels(img, seg[1], predictions),
+              "boxes", "segmentation", "predictions")
+    graph.add("pdf", lambda predictions, drawings: save_to_pdf(predictions, drawings, io.BytesIO()),
+              "predictions", "diagrams")
+    return graph
@@ -0,0 +1,76 @@
+import cv2
+
+
+class PDFBuilder:
+    """Builds the recognition report one scanned page at a time.
+
+    Drawings are downscaled and handed to FPDF as in-memory PIL images, so
+    no temporary files are written and the caller can drop each page's
+    arrays as soon as `add_page_result()` returns; FPDF keeps only the
+    compressed thumbnails. `output()` writes the finished document to a
+    path or file-like object.
+    """
+
+    def __init__(self, img_width=60, img_height=60, max_per_row=3):
+        self.img_width = img_width
+        self.img_height = img_height
+        self.max_per_row = max_per_row
+        from fpdf import FPDF
+        self.pdf = FPDF()
+        self.pages = 0
+
+    def add_text(self, predictions):
+        self.pdf.add_page()
+        self.pdf.set_font("Arial", size=12)
+        self.pdf.multi_cell(0, 10, txt=" ".join(predictions), align='L')
+
+    # Add RGB drawings in a grid
+    def add_drawings(self, drawings):
+        if not drawings:
+            return
+        from PIL import Image
+        pdf = self.pdf
+        pdf.add_page()
+        pdf.set_font("Arial", size=12)
+        pdf.cell(0, 10, txt="Detected Drawings:", ln=True, align='L')
+
+        img_x, img_y = 10, 30  # Starting position
+        for idx, drawing in enumerate(drawings):
+            thumbnail = Image.fromarray(cv2.resize(drawing, (self.img_width, self.img_height)))
+            pdf.image(thumbnail, x=img_x, y=img_y, w=self.img_width, h=self.img_height)
+
+            # Adjust position for the next image
+            img_x += self.img_width + 10
+            if (idx + 1) % self.max_per_row == 0:
+                img_x = 10
+                img_y += self.img_height + 10
+
+            # If there's overflow, reset coordinates for a new page
+            if img_y > 250:
+                pdf.add_page()
+                img_x, img_y = 10, 30
+
+    def add_page_result(self, predictions, drawings):
+        self.add_text(predictions)
+        self.add_drawings(drawings)
+        self.pages += 1
+
+    def output(self, output):
+        if isinstance(output, str):
+            self.pdf.output(output)
+        else:
+            output.write(self.pdf.output())
+        return output
+
+
+# The /process report: one PDF page per scanned page with its numbered words
+def numbered_pages_pdf(pages):
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    for predictions in pages:
+        pdf.add_page()
+        pdf.set_font("Arial", size=12)
+        for i, text in enumerate(predictions):
+            pdf.cell(0, 10, f"{i + 1}. {text}", ln=True)
+    return bytes(pdf.output())
@@ -0,0 +1,99 @@
+"""Post-training int8 quantization of the CTC word model and the character CNN.
+
+Writes two TFLite variants next to each .h5, selected at serving time with
+INFERENCE_BACKEND=tflite MODEL_VARIANT=<variant>:
+    <model>_int8_dynamic.tflite  int8 weights, float activations
+    <model>_int8.tflite          int8 weights and activations, calibrated on real crops
+
+Run from the model folder:
+    python quantize_models.py handwriting_model.h5 --words-csv images/written_name_validation_v2.csv \\
+        --words-folder images/validation_v2/validation
+    python quantize_models.py recognition_model_3.h5 --chars-csv english.csv
+"""
+import argparse
+import csv
+import os
+import cv2
+import numpy as np
+import tensorflow as tf
+from export_models import load_keras, tflite_converter
+from inference_backend import exported_path
+from recognition import preprocess_batch
+
+def read_csv_rows(csv_path, limit, offset=0):
+    with open(csv_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    return rows[offset:offset + limit]
+
+def load_word_images(csv_path, folder, limit, offset=0):
+    """Word crops from a written_name_*.csv (FILENAME, IDENTITY), preprocessed like serving."""
+    crops, labels = [], []
+    for row in read_csv_rows(csv_path, limit, offset):
+        img = cv2.imread(os.path.join(folder, row["FILENAME"]), cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            crops.append(img)
+            labels.append(str(row["IDENTITY"]).upper())
+    return preprocess_batch(crops), labels
+
+def load_char_images(csv_path, limit, offset=0, root=None):
+    """Character images from english.csv (image, label) as 64x64 inputs in [0, 1]."""
+    root = root or os.path.dirname(os.path.abspath(csv_path))
+    images, labels = [], []
+    for row in read_csv_rows(csv_path, limit, offset):
+        img = cv2.imread(os.path.join(root, row["image"]), cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            images.append(cv2.resize(img.astype("float32"), (64, 64)) / 255.0)
+            labels.append(row["label"])
+    return np.array(images, dtype=np.float32).reshape(-1, 64, 64, 1), labels
+
+def quantize(model, batch_size, calibration=None):
+    """Return a quantized TFLite model: dynamic range, or full integer with a calibration set."""
+    converter = tflite_converter(model, batch_size)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if calibration is not None:
+        def representative_dataset():
+            for start in range(0, len(calibration) - batch_size + 1, batch_size):
+                yield [calibration[start:start + batch_size]]
+        converter.representative_dataset = representative_dataset
+        # Integer kernels everywhere they exist; ops without one (the LSTM
+        # cells of the CTC model) stay float. Inputs and outputs stay float32
+        # so the serving code is unchanged.
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+    return converter.convert()
+
+def write_variant(model_path, variant, flatbuffer):
+    output_path = exported_path(model_path, "tflite", variant)
+    with open(output_path, "wb") as f:
+        f.write(flatbuffer)
+    print(f"{model_path} -> {output_path} ({len(flatbuffer) / 1e6:.1f} MB)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model", help="h5 file to quantize")
+    parser.add_argument("--words-csv", help="written_name_*.csv used to calibrate the CTC model")
+    parser.add_argument("--words-folder", help="folder holding the images of --words-csv")
+    parser.add_argument("--chars-csv", help="english.csv-style file used to calibrate the character model")
+    parser.add_argument("--calibration-size", type=int, default=256)
+    parser.add_argument("--tflite-batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    model = load_keras(args.model)
+    if args.words_csv:
+        calibration, _ = load_word_images(args.words_csv, args.words_folder, args.calibration_size)
+    elif args.chars_csv:
+        calibration, _ = load_char_images(args.chars_csv, args.calibration_size)
+    else:
+        calibration = None
+    if calibration is not None and len(calibration) < args.tflite_batch_size:
+        raise SystemExit(f"Only {len(calibration)} calibration images found, need at least {args.tflite_batch_size}")
+
+    # Written one at a time: full-integer calibration of the LSTM model can
+    # abort inside the converter, which should not cost the dynamic variant
+    write_variant(args.model, "int8_dynamic", quantize(model, args.tflite_batch_size))
+    if calibration is None:
+        print("No calibration set given, skipping the full-integer variant")
+    else:
+        write_variant(args.model, "int8", quantize(model, args.tflite_batch_size, calibration))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import numpy as np
+import cv2
+import ctc_decoder
+from metrics import timer
+
+# Number of word crops sent to the model per predict call
+DEFAULT_BATCH_SIZE = 64
+
+def preprocess_into(out, image, img_size=(256, 64), gray_code=cv2.COLOR_BGR2GRAY):
+    """Write one word crop into `out`, a float32 (img_size[0], img_size[1], 1) view.
+
+    The crop is converted to grayscale, downscaled (keeping its aspect
+    ratio) if it does not fit img_size, placed top-left on a white canvas,
+    rotated 90 degrees clockwise and scaled to [0, 1]. Rotation and
+    normalisation happen in one strided write into `out`.
+    """
+    gray = cv2.cvtColor(image, gray_code) if image.ndim == 3 else image
+    h, w = gray.shape
+    scale = min(img_size[0] / w, img_size[1] / h)
+    if scale < 1:
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        h, w = gray.shape
+
+    # Canvas pixel (r, c) lands at (c, H - 1 - r) after a clockwise rotation
+    out.fill(1.0)
+    np.divide(gray[::-1].T, np.float32(255.0), out=out[:w, img_size[1] - h:, 0])
+    return out
+
+def preprocess_batch(images, img_size=(256, 64), gray_code=cv2.COLOR_BGR2GRAY, out=None):
+    """Preprocess word crops into one preallocated float32 (N, 256, 64, 1) batch."""
+    if out is None:
+        out = np.empty((len(images), img_size[0], img_size[1], 1), dtype=np.float32)
+    for i, image in enumerate(images):
+        preprocess_into(out[i], image, img_size, gray_code)
+    return out
+
+# Preprocess a single word crop for the CTC model
+def preprocess_image(image, img_size=(256, 64)):
+    return preprocess_batch([image], img_size)
+
+# Decode a batch of CTC outputs to one string per row
+def decode_batch(prediction, alphabet, mode="greedy"):
+    return ctc_decoder.decode(prediction, alphabet, mode=mode)
+
+def predict_in_chunks(model, batch, batch_size=DEFAULT_BATCH_SIZE):
+    outputs = [model.predict_on_batch(batch[i:i + batch_size]) for i in range(0, len(batch), batch_size)]
+    return np.concatenate([np.asarray(out) for out in outputs], axis=0)
+
+def predict_cached(model, batch, batch_size=DEFAULT_BATCH_SIZE, cache=None, stats=None):
+    """predict_in_chunks() that skips rows already in a CropCache.
+
+    When `stats` is a dict its "hits" and "lookups" counts are increased,
+    so callers can report the hit rate of a page.
+    """
+    if cache is None:
+        return predict_in_chunks(model, batch, batch_size)
+    keys = [cache.key(row) for row in batch]
+    outputs = [cache.get(key) for key in keys]
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    if missing:
+        predicted = predict_in_chunks(model, batch[missing], batch_size)
+        for i, output in zip(missing, predicted):
+            outputs[i] = output.copy()
+            cache.put(keys[i], outputs[i])
+    if stats is not None:
+        stats["hits"] = stats.get("hits", 0) + len(batch) - len(missing)
+        stats["lookups"] = stats.get("lookups", 0) + len(batch)
+    return np.stack(outputs)
+
+def recognize_words(image, word_boxes, model, alphabet, batch_size=DEFAULT_BATCH_SIZE, decode_mode="greedy",
+                    cache=None, stats=None):
+    """Recognize every word box of a page with one batched pass.
+
+    All crops are written into a single (N, 256, 64, 1) tensor, predicted in
+    chunks of `batch_size` and decoded together. Results keep the order of
+    `word_boxes`, which is reading order for word_segmentation().
+    `decode_mode` is "greedy" (default) or "beam". Crops found in `cache`
+    skip inference (see predict_cached).
+    """
+    if len(word_boxes) == 0:
+        return []
+    with timer("preprocess"):
+        batch = preprocess_batch([image[y1:y2, x1:x2] for x1, y1, x2, y2 in word_boxes])
+    with timer("predict"):
+        prediction = predict_cached(model, batch, batch_size, cache, stats)
+    with timer("ctc_decode"):
+        return decode_batch(prediction, alphabet, decode_mode)
+
+# Map class indices to labels with the encoder's classes_ array instead of
+# calling inverse_transform once per character
+def build_label_lookup(label_encoder):
+    return np.asarray(label_encoder.classes_)
+
+def classify_characters(char_imgs, model, labels, batch_size=DEFAULT_BATCH_SIZE, img_size=(64, 64),
+                        cache=None, stats=None):
+    """Classify a list of grayscale character crops with one chunked predict.
+
+    Crops are resized (when needed) into one contiguous float32 batch.
+    Returns the predicted labels and the softmax confidence of each.
+    Crops found in `cache` skip inference (see predict_cached).
+    """
+    if len(char_imgs) == 0:
+        return labels[:0], np.empty(0, dtype=np.float32)
+    batch = np.empty((len(char_imgs), img_size[1], img_size[0], 1), dtype=np.float32)
+    for i, img in enumerate(char_imgs):
+        if img.shape[:2] != (img_size[1], img_size[0]):
+            img = cv2.resize(img, img_size)
+        batch[i, :, :, 0] = img
+    batch /= 255.0
+
+    probs = predict_cached(model, batch, batch_size, cache, stats)
+    indices = probs.argmax(axis=1)
+    confidences = probs[np.arange(len(indices)), indices]
+    return labels[indices], confidences
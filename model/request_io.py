@@ -0,0 +1,24 @@
+import base64
+import io
+import cv2
+import numpy as np
+
+# Request-scoped I/O: uploads are decoded from their bytes and generated files
+# are built in memory, so concurrent requests never share a path on disk.
+
+def decode_image(data, flags=cv2.IMREAD_COLOR):
+    """The decoded image, or None when `data` is not an image (imdecode raises on empty input)."""
+    if not data:
+        return None
+    return cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+
+def read_image(file_storage, flags=cv2.IMREAD_COLOR):
+    return decode_image(file_storage.read(), flags)
+
+def pdf_response(pdf_bytes, download_name):
+    # Imported here so cpu_tasks' pool workers can use decode_image without Flask
+    from flask import send_file
+    return send_file(io.BytesIO(pdf_bytes), mimetype="application/pdf", as_attachment=True, download_name=download_name)
+
+def encode_pdf(pdf_bytes):
+    return base64.b64encode(pdf_bytes).decode("ascii")
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_SIZE", 256))
+# Optional on-disk tier: path of a SQLite file and its size budget
+DISK_PATH = os.environ.get("RESULT_CACHE_DB")
+MAX_DISK_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+def model_version(path):
+    """Identify a model file by name, size and modification time."""
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+def make_key(image, model_version, params):
+    """Hash the decoded pixels together with the model version and pipeline parameters."""
+    digest = hashlib.sha256()
+    digest.update(f"{image.shape}:{image.dtype}:".encode())
+    digest.update(memoryview(image).cast("B") if image.flags.c_contiguous else image.tobytes())
+    digest.update(model_version.encode())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Two-tier cache of JSON-serializable page results.
+
+    An in-memory LRU of `max_entries` results sits in front of an optional
+    SQLite file that evicts least recently used rows once it grows past
+    `max_disk_bytes`. Disk hits are promoted to memory.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, disk_path=DISK_PATH, max_disk_bytes=MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_used REAL)")
+            self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                blob = json.dumps(value).encode()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), time.time()))
+                self._evict_disk()
+                self._db.commit()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY last_used").fetchall():
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_disk_bytes:
+                break
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
@@ -0,0 +1,250 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+# "resize" downscales pages wider than MAX_WIDTH before segmenting them.
+# "tiled" segments them at full resolution in overlapping horizontal bands
+SEGMENTATION_MODE = os.environ.get("SEGMENTATION_MODE", "resize")
+
+# Pages wider than this are downscaled before segmentation in resize mode
+MAX_WIDTH = 1000
+# Word regions with a smaller (outer contour) area are dropped as noise
+MIN_WORD_AREA = 400
+
+KERNEL_LINE = np.ones((3, 85), np.uint8)
+KERNEL_WORD = np.ones((3, 15), np.uint8)
+
+# Tiled mode minimum band height and padding, in rows of a MAX_WIDTH wide
+# page. The padding must exceed the height of a word for words to be found
+# whole
+TILE_HEIGHT = 256
+TILE_OVERLAP = 96
+TILE_WORKERS = os.cpu_count() or 1
+
+# Parameters that change segmentation output, for cache keys
+def segmentation_params():
+    params = {
+        "max_width": MAX_WIDTH,
+        "min_word_area": MIN_WORD_AREA,
+        "kernel_line": KERNEL_LINE.shape,
+        "kernel_word": KERNEL_WORD.shape,
+    }
+    if SEGMENTATION_MODE == "tiled":
+        params.update(mode=SEGMENTATION_MODE, tile_height=TILE_HEIGHT, tile_overlap=TILE_OVERLAP)
+    return params
+
+def resize_to_width(image, max_width=MAX_WIDTH):
+    h, w = image.shape[:2]
+    if w <= max_width:
+        return image
+    new_h = int(max_width / (w / h))
+    return cv2.resize(image, (max_width, new_h), interpolation=cv2.INTER_AREA)
+
+# Preprocess the image for word segmentation
+def thresholding(image, gray_code=cv2.COLOR_BGR2GRAY):
+    img_gray = cv2.cvtColor(image, gray_code)
+    _, thresh = cv2.threshold(img_gray, 80, 255, cv2.THRESH_BINARY_INV)
+    return thresh
+
+def scaled_kernels(scale):
+    """Line and word dilation kernels for a page `scale` times MAX_WIDTH wide."""
+    return tuple(np.ones((max(1, round(h * scale)), max(1, round(w * scale))), np.uint8)
+                 for h, w in (KERNEL_LINE.shape, KERNEL_WORD.shape))
+
+def _assign_lines(word_rects, words, line_rects, lines):
+    """Index of the line of each word, given rects and outer contours of both."""
+    lx, ly, lw, lh = line_rects.T
+    wx, wy, ww, wh = word_rects[:, :, None].transpose(1, 0, 2)
+
+    # Each word lies inside exactly one line region; its line is the one whose
+    # rect contains it, falling back to a polygon test when rects overlap
+    inside = (wx >= lx) & (wy >= ly) & (wx + ww <= lx + lw) & (wy + wh <= ly + lh)
+    word_line = inside.argmax(axis=1)
+    for i in np.flatnonzero(inside.sum(axis=1) > 1):
+        point = tuple(int(v) for v in words[i][0, 0])
+        for j in np.flatnonzero(inside[i]):
+            if cv2.pointPolygonTest(lines[j], point, False) >= 0:
+                word_line[i] = j
+                break
+    return word_line
+
+def _words_and_lines(thresh, kernel_line, kernel_word, min_area, cut_rows=None):
+    """Rects (x, y, w, h) and outer contours of the words and of the lines of a binary page.
+
+    Words smaller than min_area are dropped, except those reaching above
+    row cut_rows[0] or below row cut_rows[1], which may be pieces of a word
+    cut by a tile edge.
+    """
+    dilated_line = cv2.dilate(thresh, kernel_line, iterations=1)
+    dilated_word = cv2.dilate(thresh, kernel_word, iterations=1)
+    lines, _ = cv2.findContours(dilated_line, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    words, _ = cv2.findContours(dilated_word, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    keep = np.array([cv2.contourArea(c) >= min_area for c in words], bool)
+    word_rects = np.array([cv2.boundingRect(c) for c in words], np.int32).reshape(-1, 4)
+    if cut_rows is not None:
+        keep |= (word_rects[:, 1] < cut_rows[0]) | (word_rects[:, 1] + word_rects[:, 3] > cut_rows[1])
+    line_rects = np.array([cv2.boundingRect(c) for c in lines], np.int32).reshape(-1, 4)
+    return word_rects[keep], [c for c, k in zip(words, keep) if k], line_rects, list(lines)
+
+def _reading_order(word_rects, line_rects):
+    """(N, 4) x1, y1, x2, y2 boxes sorted lines top to bottom, words left to right."""
+    order = np.lexsort((word_rects[:, 0], line_rects[:, 0], line_rects[:, 1]))
+    boxes = word_rects[order]
+    boxes[:, 2:] += boxes[:, :2]
+    return boxes
+
+def find_word_boxes(thresh, min_area=MIN_WORD_AREA, kernel_line=KERNEL_LINE, kernel_word=KERNEL_WORD):
+    """Return word boxes of a binary page as an (N, 4) int32 array of x1, y1, x2, y2.
+
+    Lines and words are the outer contours of the page dilated with a wide
+    and a narrow kernel. Both are found with one pass over the whole page
+    rather than one findContours call per line, and every bounding rect is
+    computed once. Boxes are sorted in reading order: lines top to bottom,
+    words left to right.
+    """
+    word_rects, words, line_rects, lines = _words_and_lines(thresh, kernel_line, kernel_word, min_area)
+    if not len(word_rects):
+        return np.empty((0, 4), np.int32)
+    return _reading_order(word_rects, line_rects[_assign_lines(word_rects, words, line_rects, lines)])
+
+def _group_touching(rects):
+    """Label (x, y, w, h) rects so that overlapping or touching ones share a label."""
+    x1, y1 = rects[:, 0], rects[:, 1]
+    x2, y2 = x1 + rects[:, 2], y1 + rects[:, 3]
+    touch = (x1[:, None] <= x2) & (x1 <= x2[:, None]) & (y1[:, None] <= y2) & (y1 <= y2[:, None])
+    labels = np.arange(len(rects))
+    while True:
+        merged = np.where(touch, labels, len(rects)).min(axis=1, initial=len(rects))
+        if (merged == labels).all():
+            return labels
+        labels = merged
+
+def _components_at(image, gray_code, kernel, rects, seeds):
+    """Rect (x, y, w, h) and outer contour of the dilated page component holding each seed pixel.
+
+    `rects` are pieces of components cut by band edges, each holding its
+    seed. All pieces of one component overlap in the band padding, so they
+    fall in one group of touching rects whose bounding box contains the
+    whole component. That box, padded by the kernel, is segmented again
+    and pieces are joined only where their pixels connect.
+    """
+    out_rects = np.empty((len(rects), 4), np.int32)
+    out_contours = [None] * len(rects)
+    labels = _group_touching(rects)
+    pad_y, pad_x = kernel.shape
+    for label in np.unique(labels):
+        group = np.flatnonzero(labels == label)
+        x1, y1 = np.maximum(rects[group, :2].min(axis=0) - (pad_x, pad_y), 0)
+        x2, y2 = (rects[group, :2] + rects[group, 2:]).max(axis=0) + (pad_x, pad_y)
+        dilated = cv2.dilate(thresholding(image[y1:y2, x1:x2], gray_code), kernel, iterations=1)
+        _, components = cv2.connectedComponents(dilated, connectivity=8)
+        found = {}
+        for i in group:
+            component = components[seeds[i, 1] - y1, seeds[i, 0] - x1]
+            if component not in found:
+                contours, _ = cv2.findContours((components == component).astype(np.uint8), cv2.RETR_EXTERNAL,
+                                               cv2.CHAIN_APPROX_SIMPLE)
+                found[component] = cv2.boundingRect(contours[0]) + np.array([x1, y1, 0, 0]), contours[0] + (x1, y1)
+            out_rects[i], out_contours[i] = found[component]
+    return out_rects, out_contours
+
+def _join_pieces(image, gray_code, kernel, rects, contours, cut):
+    """Rects and outer contours of the page components that the band components are whole copies or pieces of.
+
+    Components clear of their band's cut edges are exact and deduplicated
+    across bands. Pieces inside one of them are dropped and the rest, of
+    components cut in every band, are found again with _components_at().
+    A band that cuts a component open also opens its holes, so components
+    inside the hole of another one are dropped: the full page has none.
+    """
+    whole = np.flatnonzero(~cut)
+    whole = whole[np.unique(rects[whole], axis=0, return_index=True)[1]]
+    pieces = np.flatnonzero(cut)
+    px1, py1 = rects[pieces, 0, None], rects[pieces, 1, None]
+    px2, py2 = px1 + rects[pieces, 2, None], py1 + rects[pieces, 3, None]
+    wx1, wy1 = rects[whole, 0], rects[whole, 1]
+    wx2, wy2 = wx1 + rects[whole, 2], wy1 + rects[whole, 3]
+    pieces = pieces[~((px1 >= wx1) & (py1 >= wy1) & (px2 <= wx2) & (py2 <= wy2)).any(axis=1)]
+    seeds = np.array([contours[i][0, 0] for i in pieces], np.int32).reshape(-1, 2)
+    joined, joined_contours = _components_at(image, gray_code, kernel, rects[pieces], seeds)
+    first = np.unique(joined, axis=0, return_index=True)[1]
+    contours = [contours[i] for i in whole] + [joined_contours[i] for i in first]
+    rects = np.concatenate([rects[whole], joined[first]])
+
+    x1, y1 = rects[:, 0], rects[:, 1]
+    x2, y2 = x1 + rects[:, 2], y1 + rects[:, 3]
+    within = (x1[:, None] > x1) & (y1[:, None] > y1) & (x2[:, None] < x2) & (y2[:, None] < y2)
+    enclosed = np.zeros(len(rects), bool)
+    for i, j in zip(*np.nonzero(within)):
+        enclosed[i] |= cv2.pointPolygonTest(contours[j], tuple(int(v) for v in contours[i][0, 0]), False) > 0
+    return rects[~enclosed], [c for c, e in zip(contours, enclosed) if not e]
+
+def find_word_boxes_tiled(image, scale, gray_code=cv2.COLOR_BGR2GRAY, min_area=MIN_WORD_AREA, workers=TILE_WORKERS):
+    """find_word_boxes() of a full-resolution page, segmented in parallel horizontal bands.
+
+    Kernels and min_area are scaled by `scale` so they cover as much of the
+    page as on a MAX_WIDTH wide page. The page is split into up to `workers`
+    bands, each padded with TILE_OVERLAP rows on both sides and thresholded
+    and segmented on its own thread (OpenCV releases the GIL). Words and
+    lines of all bands are joined into those of the page by _join_pieces(),
+    so pieces only join where their pixels connect, and words are then
+    assigned to lines as in find_word_boxes().
+    """
+    kernel_line, kernel_word = scaled_kernels(scale)
+    min_area = min_area * scale * scale
+    height = image.shape[0]
+    # One band per worker: more bands only add overlap
+    step = max(1, round(TILE_HEIGHT * scale), -(-height // workers))
+    overlap = round(TILE_OVERLAP * scale)
+    # Contours this close to a cut edge may join ink on the other side of it
+    margin = kernel_line.shape[0] + 1
+    bands = [(max(0, top - overlap), min(height, top + step + overlap)) for top in range(0, height, step)]
+
+    def segment_band(band):
+        start, end = band
+        top = start + margin if start > 0 else start
+        bottom = end - margin if end < height else end
+        word_rects, words, line_rects, lines = _words_and_lines(
+            thresholding(image[start:end], gray_code), kernel_line, kernel_word, min_area,
+            (top - start, bottom - start))
+        word_rects[:, 1] += start
+        line_rects[:, 1] += start
+        words = [c + (0, start) for c in words]
+        lines = [c + (0, start) for c in lines]
+        cut = (word_rects[:, 1] < top) | (word_rects[:, 1] + word_rects[:, 3] > bottom)
+        line_cut = (line_rects[:, 1] < top) | (line_rects[:, 1] + line_rects[:, 3] > bottom)
+        return word_rects, words, cut, line_rects, lines, line_cut
+
+    with ThreadPoolExecutor(min(workers, len(bands))) as pool:
+        results = list(pool.map(segment_band, bands))
+    word_rects, cut, line_rects, line_cut = (np.concatenate([result[i] for result in results]) for i in (0, 2, 3, 5))
+    words, lines = ([c for result in results for c in result[i]] for i in (1, 4))
+
+    word_rects, words = _join_pieces(image, gray_code, kernel_word, word_rects, words, cut)
+    keep = [i for i, c in enumerate(words) if cv2.contourArea(c) >= min_area]
+    if not keep:
+        return np.empty((0, 4), np.int32)
+    word_rects, words = word_rects[keep], [words[i] for i in keep]
+    line_rects, lines = _join_pieces(image, gray_code, kernel_line, line_rects, lines, line_cut)
+    word_line = _assign_lines(word_rects, words, line_rects, lines)
+    # Words of a line at the same x come out top first
+    top_first = np.argsort(word_rects[:, 1], kind="stable")
+    return _reading_order(word_rects[top_first], line_rects[word_line[top_first]])
+
+def page_image(image, mode=SEGMENTATION_MODE):
+    """The image that word_segmentation() boxes refer to."""
+    return image if mode == "tiled" else resize_to_width(image)
+
+def word_segmentation(image, gray_code=cv2.COLOR_BGR2GRAY, min_area=MIN_WORD_AREA, mode=SEGMENTATION_MODE):
+    """Return the page word boxes refer to and its (N, 4) word boxes.
+
+    In "resize" mode pages are downscaled to MAX_WIDTH first. In "tiled"
+    mode wider pages are segmented at full resolution, so word crops keep
+    every pixel of the scan.
+    """
+    width = image.shape[1]
+    if mode == "tiled" and width > MAX_WIDTH:
+        return image, find_word_boxes_tiled(image, width / MAX_WIDTH, gray_code, min_area)
+    image = resize_to_width(image)
+    return image, find_word_boxes(thresholding(image, gray_code), min_area)
@@ -0,0 +1,129 @@
+"""Pack a dataset into fixed-shape uint8 .npy shards and read them back zero-copy.
+
+Packing decodes and preprocesses every image once (64x64 for characters,
+the 256x64 rotated word canvas for words, exactly as served) and writes:
+    <out>/images_00000.npy ...   uint8 (n, H, W, 1) shards
+    <out>/labels.npy             one label per image, in shard order
+    <out>/index.json             kind, shape and per-shard counts
+
+Run from the model folder:
+    python shards.py chars english.csv packed/chars
+    python shards.py words images/written_name_train_v2.csv packed/words_train --folder images/train_v2/train
+
+PackedDataset opens the shards with np.load(mmap_mode="r"), so loading is
+instant and the page cache is shared by every experiment reading them.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from recognition import preprocess_into
+
+SHAPES = {"chars": (64, 64, 1), "words": (256, 64, 1)}
+SHARD_SIZE = 50000
+
+def _pack_char(path, out):
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError(f"Cannot read image: {path}")
+    out[:, :, 0] = cv2.resize(img, (out.shape[1], out.shape[0]))
+
+def _pack_word(path, out):
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError(f"Cannot read image: {path}")
+    canvas = preprocess_into(np.empty(out.shape, dtype=np.float32), img, out.shape[:2])
+    # Canvas values are k / 255, so this round trip is exact
+    np.rint(canvas * 255.0, out=canvas)
+    out[...] = canvas
+
+def pack_dataset(paths, labels, output_dir, kind, shard_size=SHARD_SIZE, workers=8):
+    """Preprocess `paths` into uint8 shards under `output_dir` and write the index."""
+    pack = {"chars": _pack_char, "words": _pack_word}[kind]
+    shape = SHAPES[kind]
+    os.makedirs(output_dir, exist_ok=True)
+    shards = []
+    with ThreadPoolExecutor(workers) as pool:
+        for number, start in enumerate(range(0, len(paths), shard_size)):
+            chunk = paths[start:start + shard_size]
+            name = f"images_{number:05d}.npy"
+            images = np.lib.format.open_memmap(os.path.join(output_dir, name), mode="w+", dtype=np.uint8,
+                                               shape=(len(chunk),) + shape)
+            # Each worker writes straight into its slot of the memmap
+            list(pool.map(pack, chunk, images))
+            images.flush()
+            del images
+            shards.append({"file": name, "count": len(chunk)})
+            print(f"{name}: {len(chunk)} images")
+    np.save(os.path.join(output_dir, "labels.npy"), np.asarray(labels, dtype=str))
+    with open(os.path.join(output_dir, "index.json"), "w") as f:
+        json.dump({"kind": kind, "shape": shape, "shards": shards}, f, indent=2)
+
+
+class PackedDataset:
+    """Read-only view over a packed directory.
+
+    `images` holds one memmap per shard; nothing is read until it is
+    indexed. `batch()` gathers rows into a float32 array in [0, 1], the
+    model input format.
+    """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, "index.json")) as f:
+            self.index = json.load(f)
+        self.kind = self.index["kind"]
+        self.shape = tuple(self.index["shape"])
+        self.images = [np.load(os.path.join(directory, shard["file"]), mmap_mode="r")
+                       for shard in self.index["shards"]]
+        self.labels = np.load(os.path.join(directory, "labels.npy"))
+        self._offsets = np.cumsum([0] + [len(images) for images in self.images])
+
+    def __len__(self):
+        return int(self._offsets[-1])
+
+    def batch(self, indices, out=None):
+        indices = np.asarray(indices)
+        if out is None:
+            out = np.empty((len(indices),) + self.shape, dtype=np.float32)
+        shard_ids = np.searchsorted(self._offsets, indices, side="right") - 1
+        for shard_id in np.unique(shard_ids):
+            rows = np.flatnonzero(shard_ids == shard_id)
+            local = indices[rows] - self._offsets[shard_id]
+            out[rows] = self.images[shard_id][local]
+        out /= 255.0
+        return out, self.labels[indices]
+
+    def iter_batches(self, batch_size, shuffle=True, seed=None):
+        """Yield (images, labels) batches for one epoch.
+
+        Shuffled indices are sorted within each batch so reads stay mostly
+        sequential in the memmaps. Wrap with tf.data.Dataset.from_generator
+        or feed to model.fit directly.
+        """
+        order = np.random.default_rng(seed).permutation(len(self)) if shuffle else np.arange(len(self))
+        for start in range(0, len(order), batch_size):
+            yield self.batch(np.sort(order[start:start + batch_size]))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("kind", choices=sorted(SHAPES))
+    parser.add_argument("csv", help="english.csv-style file for chars, written_name_*.csv for words")
+    parser.add_argument("output_dir")
+    parser.add_argument("--folder", help="image folder of a written_name_*.csv")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    from training_data import char_records_from_csv, word_records_from_csv
+    if args.kind == "chars":
+        paths, labels = char_records_from_csv(args.csv)
+    else:
+        if not args.folder:
+            parser.error("--folder is required for words")
+        paths, labels = word_records_from_csv(args.csv, args.folder)
+    pack_dataset(paths, labels, args.output_dir, args.kind, args.shard_size, args.workers)
+
+if __name__ == "__main__":
+    main()
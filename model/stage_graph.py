@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+WORKERS = int(os.environ.get("STAGE_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Pools live for the whole process: OpenCV sets up some state (fonts for
+# putText take about 20 ms) once per thread, so fresh threads per run are slow
+_pools = {}
+_pools_lock = threading.Lock()
+
+def shared_pool(workers):
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ThreadPoolExecutor(workers, thread_name_prefix="stage")
+        return _pools[workers]
+
+
+class StageGraph:
+    """Small DAG executor: every stage starts as soon as the stages it reads have finished.
+
+    `add(name, fn, *deps)` registers a stage computed as fn(*results of deps).
+    Stages run in a thread pool: OpenCV and the model runtimes release the
+    GIL, and the model is shared without pickling it into other processes.
+    With workers=1 the stages run one at a time in the order they were added.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        # name -> (start, end) seconds since the start of the last run()
+        self.timings = {}
+
+    def add(self, name, fn, *deps):
+        self.stages[name] = (fn, deps)
+
+    def run(self, inputs=None, workers=WORKERS):
+        """Run every stage not already in `inputs` and return all results by name.
+
+        The first stage to raise cancels the stages not started yet and its
+        exception is re-raised.
+        """
+        results = dict(inputs or {})
+        remaining = {name: stage for name, stage in self.stages.items() if name not in results}
+        self.timings = {}
+        origin = time.perf_counter()
+
+        def timed_call(name, fn, args):
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self.timings[name] = (start - origin, time.perf_counter() - origin)
+
+        pool = shared_pool(workers)
+        running = {}
+        try:
+            while remaining or running:
+                for name, (fn, deps) in list(remaining.items()):
+                    if all(dep in results for dep in deps):
+                        del remaining[name]
+                        running[pool.submit(timed_call, name, fn, [results[dep] for dep in deps])] = name
+                if not running:
+                    missing = {dep for _, deps in remaining.values() for dep in deps if dep not in self.stages}
+                    raise ValueError(f"Stages wait on unknown or cyclic inputs: {sorted(missing) or sorted(remaining)}")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+        return results
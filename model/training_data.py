@@ -0,0 +1,138 @@
+"""Streaming tf.data input pipelines for the character and word models.
+
+Records (file path, label) are read from a folder or a CSV up front; images
+are decoded in parallel map calls batch by batch, so memory stays bounded by
+the shuffle and prefetch buffers instead of the dataset size. Decoding uses
+the same preprocessing as serving (recognition.py).
+
+    records = char_records_from_csv("english.csv")
+    train, classes = char_dataset(*records, batch_size=32, cache="cache/chars")
+    model.fit(train, epochs=20)
+
+    paths, texts = word_records_from_csv("images/written_name_train_v2.csv", "images/train_v2/train")
+    model_final.fit(word_dataset(paths, texts, batch_size=64), epochs=10)
+"""
+import csv
+import os
+import cv2
+import numpy as np
+import tensorflow as tf
+from recognition import preprocess_into
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ-' "
+MAX_LABEL_LENGTH = 24
+# The CTC loss skips the first two of the model's 64 timesteps
+CTC_INPUT_LENGTH = 62
+
+def char_records_from_folder(folder):
+    """Image paths and labels of a folder of <anything>_<label>.<ext> files."""
+    paths, labels = [], []
+    with os.scandir(folder) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(entry.path)
+                labels.append(entry.name.split('_')[-1].split('.')[0])
+    return paths, labels
+
+def char_records_from_csv(csv_path, root=None, path_column="image", label_column="label"):
+    """Image paths and labels of an english.csv-style file; paths are relative to `root`."""
+    root = root or os.path.dirname(os.path.abspath(csv_path))
+    paths, labels = [], []
+    with open(csv_path, newline="") as f:
+        for row in csv.DictReader(f):
+            paths.append(os.path.join(root, row[path_column]))
+            labels.append(row[label_column])
+    return paths, labels
+
+def word_records_from_csv(csv_path, folder):
+    """Image paths and upper-cased texts of a written_name_*.csv.
+
+    Drops the rows Model.ipynb drops (missing or UNREADABLE identities) and
+    texts the CTC model cannot represent.
+    """
+    paths, texts = [], []
+    with open(csv_path, newline="") as f:
+        for row in csv.DictReader(f):
+            text = (row["IDENTITY"] or "").upper()
+            if not text or text == "UNREADABLE" or len(text) > MAX_LABEL_LENGTH:
+                continue
+            if any(ch not in ALPHABET for ch in text):
+                continue
+            paths.append(os.path.join(folder, row["FILENAME"]))
+            texts.append(text)
+    return paths, texts
+
+def encode_texts(texts):
+    """CTC targets: label indices padded with -1, and label lengths."""
+    labels = np.full((len(texts), MAX_LABEL_LENGTH), -1, dtype=np.float32)
+    lengths = np.zeros((len(texts), 1), dtype=np.int64)
+    for i, text in enumerate(texts):
+        labels[i, :len(text)] = [ALPHABET.index(ch) for ch in text]
+        lengths[i] = len(text)
+    return labels, lengths
+
+def _read_char(path, img_size):
+    img = cv2.imread(path.decode(), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError(f"Cannot read image: {path.decode()}")
+    return (cv2.resize(img, img_size).astype(np.float32) / 255.0)[..., None]
+
+def _read_word(path, img_size):
+    img = cv2.imread(path.decode(), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError(f"Cannot read image: {path.decode()}")
+    return preprocess_into(np.empty((img_size[0], img_size[1], 1), dtype=np.float32), img, img_size)
+
+def _pipeline(records, load, batch_size, shuffle, cache, seed):
+    """Shared ordering of the shuffle, decode, cache, batch and prefetch stages.
+
+    Without a cache, file names are shuffled before decoding (a full-size
+    buffer of strings is cheap). With one, decoded samples are cached first
+    and shuffled in a bounded buffer each epoch. `cache` is a file prefix
+    for an on-disk cache, "" for an in-memory one, or None.
+    """
+    ds = tf.data.Dataset.from_tensor_slices(records)
+    if shuffle and cache is None:
+        ds = ds.shuffle(len(records[0]), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.map(load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    if cache is not None:
+        ds = ds.cache(cache)
+        if shuffle:
+            ds = ds.shuffle(16 * batch_size, seed=seed, reshuffle_each_iteration=True)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def char_dataset(paths, labels, classes=None, img_size=(64, 64), batch_size=32, shuffle=True, cache=None,
+                 one_hot=False, seed=None):
+    """Batches of (64x64x1 image, label index) for the character CNN.
+
+    `classes` fixes the label order (e.g. a fitted LabelEncoder's classes_);
+    by default it is the sorted set of labels. Returns the dataset and the
+    classes. Use one_hot=True for models trained with categorical_crossentropy.
+    """
+    classes = np.asarray(sorted(set(labels)) if classes is None else classes)
+    lookup = {label: i for i, label in enumerate(classes.tolist())}
+    indices = np.array([lookup[label] for label in labels], dtype=np.int64)
+
+    def load(path, index):
+        image = tf.numpy_function(lambda p: _read_char(p, img_size), [path], tf.float32)
+        image.set_shape((img_size[1], img_size[0], 1))
+        return image, tf.one_hot(index, len(classes)) if one_hot else index
+
+    return _pipeline((list(paths), indices), load, batch_size, shuffle, cache, seed), classes
+
+def word_dataset(paths, texts, img_size=(256, 64), batch_size=64, shuffle=True, cache=None, seed=None):
+    """Batches of ((image, labels, input_length, label_length), 0) for the CTC training model.
+
+    The inputs match model_final in Model.ipynb; the dummy target feeds its
+    pass-through ctc loss.
+    """
+    labels, lengths = encode_texts(texts)
+    input_lengths = np.full((len(texts), 1), CTC_INPUT_LENGTH, dtype=np.int64)
+
+    def load(path, label, input_length, label_length):
+        image = tf.numpy_function(lambda p: _read_word(p, img_size), [path], tf.float32)
+        image.set_shape((img_size[0], img_size[1], 1))
+        return (image, label, input_length, label_length), tf.zeros(())
+
+    return _pipeline((list(paths), labels, input_lengths, lengths), load, batch_size, shuffle, cache, seed)